@@ -0,0 +1,116 @@
+from __future__ import division
+
+import math
+
+import numpy
+
+from follower import rowAttribute, DISTANCE_ROOT
+from grid import SpatialGrid
+
+# Attractors each agent steers towards, blended by strength
+NEAREST_ATTRACTORS = 2
+# Smallest grid cell for the nearest-attractor search
+MIN_CELL = DISTANCE_ROOT
+
+# Source of an attractor that sits on the stepper's target, the cursor
+CURSOR = 'cursor'
+
+# Struct-of-arrays set of points the flock steers towards instead of the one
+# cursor target.  Each has a weight and a falloff: its pull on an agent d away
+# is weight/(1 + (d/falloff)**2), so falloff is the distance at which the
+# pull halves, and an infinite falloff pulls the same from anywhere.  Every
+# agent only weighs its nearest attractors against each other, found through
+# a grid, so the cost grows with the flock rather than flock times attractors.
+# Attractors with a source move to it every time the stepper samples the
+# cursor: CURSOR follows the target, anything else is a cursor.py source
+# whose position() is read.
+class AttractorSet(object):
+
+    def __init__(self, nearest=NEAREST_ATTRACTORS, capacity=4):
+        self.nearest = nearest
+        self.grid = SpatialGrid(MIN_CELL)
+        self.count = 0
+        self.capacity = 0
+        self.views = []
+        self.sources = []
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.weight = numpy.zeros(0)
+        self.falloff = numpy.zeros(0)
+        self.reserve(capacity)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name in ('x', 'y', 'weight', 'falloff'):
+            old = getattr(self, name)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, x=0, y=0, weight=1.0, falloff=None, source=None):
+        if self.count == self.capacity:
+            self.reserve(max(4, self.capacity*2))
+        i = self.count
+        self.count += 1
+        self.x[i] = x
+        self.y[i] = y
+        self.weight[i] = weight
+        self.falloff[i] = numpy.inf if falloff is None else falloff
+        self.sources.append(source)
+        view = Attractor(self, i)
+        self.views.append(view)
+        return view
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views)
+
+    # Moves every attractor with a source onto it; target is the QPointF of
+    # the cursor
+    def follow(self, target):
+        for i, source in enumerate(self.sources):
+            if source is None:
+                continue
+            if source == CURSOR:
+                self.x[i], self.y[i] = target.x(), target.y()
+            else:
+                self.x[i], self.y[i] = source.position()
+
+    # Pull of attractors rows on agents distance away
+    def strength(self, rows, distance):
+        return self.weight[rows]/(1 + (distance/self.falloff[rows])**2)
+
+    # The nearest attractors to each of the points x, y: an (n, k) array of
+    # rows, nearest first, and the squared distances to them
+    def nearestTo(self, x, y):
+        n = self.count
+        xAttractor = self.x[:n]
+        yAttractor = self.y[:n]
+        # About one attractor per cell across the area they cover
+        spread = max(xAttractor.max() - xAttractor.min(), yAttractor.max() - yAttractor.min())
+        self.grid.cellSize = max(MIN_CELL, spread/math.ceil(math.sqrt(n)))
+        self.grid.rebuild(xAttractor, yAttractor)
+        return self.grid.nearestK(x, y, self.nearest)
+
+# A view over one row of an AttractorSet
+class Attractor(object):
+    def __init__(self, attractors, index):
+        self.attractors = attractors
+        self.index = index
+
+    x = rowAttribute('x', owner='attractors')
+    y = rowAttribute('y', owner='attractors')
+    weight = rowAttribute('weight', owner='attractors')
+    falloff = rowAttribute('falloff', owner='attractors')
+
+    @property
+    def source(self):
+        return self.attractors.sources[self.index]
+
+    @source.setter
+    def source(self, value):
+        self.attractors.sources[self.index] = value
@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import argparse, gc, sys, time
+
+import numpy
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from PySide import QtGui
+
+from cursor import ScriptedCursor, circlePath
+from dasher import DasherBatch, HIST
+from flock import DETAIL_SHADED, DETAIL_SPARSE
+from orbiter import sol
+from stepper import Stepper
+
+# Offscreen surface every frame is painted into
+WIDTH = 1920
+HEIGHT = 1080
+
+clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = (8, 32, 128, 512, 2048, 10000)
+SPECIES = ('follower', 'dasher', 'orbiter', 'sol', 'spread', 'clustered')
+WARMUP = 5
+
+# Followers of the spread and clustered cases steer between this many
+# attractors, scattered over the screen or packed into a corner patch CLUSTER
+# pixels across, which leaves most of the flock far from all of them
+ATTRACTORS = 64
+CLUSTER = 150
+
+def populate(stepper, species, count, depth):
+    if species == 'follower':
+        stepper.spawnFollowers(count, WIDTH, HEIGHT)
+    elif species == 'dasher':
+        stepper.dashers = DasherBatch(count, depth)
+        stepper.spawnDashers(count)
+    elif species == 'orbiter':
+        stepper.spawnOrbiters(count)
+    elif species == 'sol':
+        stepper.addOrbiters(sol)
+    elif species in ('spread', 'clustered'):
+        stepper.spawnFollowers(count, WIDTH, HEIGHT)
+        random = numpy.random.RandomState(1)
+        width, height = (WIDTH, HEIGHT) if species == 'spread' else (CLUSTER, CLUSTER)
+        for i in range(ATTRACTORS):
+            stepper.attractors.add(random.uniform(0, width), random.uniform(0, height), 1, 200)
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction*len(ordered)))]
+
+def paint(image, stepper):
+    image.fill(0)
+    painter = QtGui.QPainter(image)
+    stepper.draw(painter)
+    painter.end()
+
+# Peak bytes allocated while running fn, traced in a separate pass since
+# tracemalloc slows everything else down
+def allocated(fn, repeats):
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    peaks = []
+    for i in range(repeats):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return percentile(peaks, 0.5)
+
+def measure(species, count, ticks, image, depth=HIST, detail=DETAIL_SHADED, compiled=True):
+    stepper = Stepper(ScriptedCursor(circlePath(WIDTH/2, HEIGHT/2, 300, 360)), seed=1)
+    stepper.setDetail(detail)
+    stepper.flock.compiled &= compiled
+    populate(stepper, species, count, depth)
+    for i in range(WARMUP):
+        stepper.tick()
+
+    tickTimes = []
+    paintTimes = []
+    gc.disable()
+    try:
+        for i in range(ticks):
+            start = clock()
+            stepper.tick()
+            middle = clock()
+            paint(image, stepper)
+            end = clock()
+            tickTimes.append(middle - start)
+            paintTimes.append(end - middle)
+    finally:
+        gc.enable()
+
+    tickAlloc = allocated(stepper.tick, min(ticks, 20))
+    tickP99 = percentile(tickTimes, 0.99)
+    paintP99 = percentile(paintTimes, 0.99)
+    return {
+        'species': species,
+        'count': len(stepper.pieces),
+        'tick50': percentile(tickTimes, 0.5)*1000,
+        'tick99': tickP99*1000,
+        'paint50': percentile(paintTimes, 0.5)*1000,
+        'paint99': paintP99*1000,
+        'alloc': tickAlloc,
+        'tps': 1/(tickP99 + paintP99),
+        }
+
+def report(row, out):
+    alloc = '-' if row['alloc'] is None else '%.1f' % (row['alloc']/1024)
+    out.write('%-9s %6d %9.3f %9.3f %9.3f %9.3f %10s %8.0f\n' % (
+        row['species'], row['count'], row['tick50'], row['tick99'],
+        row['paint50'], row['paint99'], alloc, row['tps']))
+    out.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Tick and paint cost per agent type and flock size")
+    parser.add_argument('--species', nargs='+', choices=SPECIES, default=SPECIES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--depth', type=int, default=HIST, help="dasher trail length")
+    parser.add_argument('--detail', type=int, default=DETAIL_SHADED,
+                        choices=range(DETAIL_SHADED, DETAIL_SPARSE + 1), help="follower level of detail")
+    parser.add_argument('--interpreted', action='store_true', help="step followers with numpy even when Numba is installed")
+    args = parser.parse_args()
+
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+    image = QtGui.QImage(WIDTH, HEIGHT, QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    out = sys.stdout
+    out.write('%-9s %6s %9s %9s %9s %9s %10s %8s\n' % (
+        'species', 'N', 'tick p50', 'tick p99', 'paint p50', 'paint p99', 'KiB/tick', 'max TPS'))
+    for species in args.species:
+        # sol is a fixed set of planets, so there is nothing to sweep
+        sizes = (len(sol),) if species == 'sol' else args.sizes
+        for count in sizes:
+            report(measure(species, count, args.ticks, image, args.depth, args.detail, not args.interpreted), out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+from __future__ import division
+
+import time
+
+# Never run more than this many simulation steps for one frame.  Past it the
+# backlog is dropped instead of letting a slow frame cause an even slower one.
+MAX_SUBSTEPS = 5
+
+# Share of the frame interval the tick plus paint may take before the
+# budget starts shedding load, and below which it gives some back
+BUDGET_HIGH = 0.8
+BUDGET_LOW = 0.4
+# Weight of the newest sample in the moving average of the frame cost
+SMOOTHING = 0.1
+# Frames between two adjustments, so each one has time to show
+ADAPT_EVERY = 30
+MIN_FPS = 15
+FPS_STEP = 5
+POPULATION_STEP = 0.1
+
+# Seconds the cursor must be still before the overlay slows down, and before
+# it stops simulating altogether
+IDLE_AFTER = 2
+FREEZE_AFTER = 30
+# Tick and frame rate while idle; frozen, the cursor is still polled this often
+IDLE_TPS = 15
+POLL_FPS = 15
+
+ACTIVE = 0
+IDLE = 1
+FROZEN = 2
+
+# Accumulator for a fixed simulation timestep.  advance() says how many steps
+# of 1/tps seconds are due since the last frame, and alpha() how far between
+# the last two simulation states the frame should be drawn.
+class FixedStep(object):
+
+    def __init__(self, tps, clock=time.time):
+        self.step = 1/tps
+        self.clock = clock
+        self.accumulator = 0
+        self.last = None
+
+    def advance(self):
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+            return 1
+        self.accumulator += now - self.last
+        self.last = now
+        steps = int(self.accumulator/self.step)
+        if steps > MAX_SUBSTEPS:
+            steps = MAX_SUBSTEPS
+            self.accumulator = 0
+        else:
+            self.accumulator -= steps*self.step
+        return steps
+
+    def alpha(self):
+        return min(self.accumulator/self.step, 1)
+
+    def setTps(self, tps):
+        self.step = 1/tps
+
+    # Forget the time spent paused, so the next frame gets one step, not a backlog
+    def reset(self):
+        self.accumulator = 0
+        self.last = None
+
+# Watches what each frame costs against the frame interval.  When frames run
+# long it first lowers the level of detail one step at a time up to
+# maxDetail, then the frame rate down to minFps, then thins the flock; when
+# there is room again it undoes the same steps in reverse order.  The
+# simulation rate is left alone so the flock keeps its speed.
+class FrameBudget(object):
+
+    def __init__(self, fps, population, minFps=MIN_FPS, minPopulation=1, maxDetail=0):
+        self.fps = self.maxFps = fps
+        self.population = self.maxPopulation = population
+        self.minFps = minFps
+        self.minPopulation = minPopulation
+        self.detail = 0
+        self.maxDetail = maxDetail
+        self.cost = 0
+        self.frames = 0
+
+    # Returns True when detail, fps or population changed
+    def record(self, cost):
+        self.cost += (cost - self.cost)*SMOOTHING
+        self.frames += 1
+        if self.frames < ADAPT_EVERY:
+            return False
+        self.frames = 0
+
+        interval = 1/self.fps
+        step = max(1, int(self.maxPopulation*POPULATION_STEP))
+        if self.cost > interval*BUDGET_HIGH:
+            if self.detail < self.maxDetail:
+                self.detail += 1
+            elif self.fps > self.minFps:
+                self.fps = max(self.minFps, self.fps - FPS_STEP)
+            elif self.population > self.minPopulation:
+                self.population = max(self.minPopulation, self.population - step)
+            else:
+                return False
+        elif self.cost < interval*BUDGET_LOW:
+            if self.population < self.maxPopulation:
+                self.population = min(self.maxPopulation, self.population + step)
+            elif self.fps < self.maxFps:
+                self.fps = min(self.maxFps, self.fps + FPS_STEP)
+            elif self.detail > 0:
+                self.detail -= 1
+            else:
+                return False
+        else:
+            return False
+        return True
+
+# Decides how hard the overlay works from how long the cursor has been still.
+# ACTIVE runs at full rate.  After idleAfter seconds it goes IDLE, ticking and
+# painting at idleTps only, and after freezeAfter seconds, by when the flock
+# has long settled into its orbit, FROZEN: no ticks and no paints, only a
+# cursor poll pollFps times a second.  Any movement goes straight back to
+# ACTIVE.  Either delay may be None to never enter that mode.
+class IdleThrottle(object):
+
+    def __init__(self, idleAfter=IDLE_AFTER, freezeAfter=FREEZE_AFTER, idleTps=IDLE_TPS, pollFps=POLL_FPS):
+        self.idleAfter = idleAfter
+        self.freezeAfter = freezeAfter
+        self.idleTps = idleTps
+        self.pollFps = pollFps
+        self.mode = ACTIVE
+
+    # Returns True when the mode changed
+    def update(self, moved, stillFor):
+        if moved:
+            mode = ACTIVE
+        elif self.freezeAfter is not None and stillFor >= self.freezeAfter:
+            mode = FROZEN
+        elif self.idleAfter is not None and stillFor >= self.idleAfter:
+            mode = IDLE
+        else:
+            mode = self.mode
+        changed = mode != self.mode
+        self.mode = mode
+        return changed
@@ -0,0 +1,134 @@
+from __future__ import division
+
+import math, time
+
+from ctypes import Structure, c_long, byref
+
+from PySide import QtGui
+
+# Cursor sources all answer position() with the current (x, y) in desktop
+# coordinates.  The boards and the headless Stepper only ever talk to one of
+# these, so the simulation runs the same whether the samples come from the
+# OS, Qt, a recording or a script.
+
+class POINT(Structure):
+    _fields_ = [("x", c_long), ("y", c_long)]
+
+class WindowsCursor(object):
+    def __init__(self):
+        from ctypes import windll
+        self.user32 = windll.user32
+        self.point = POINT()
+
+    def position(self):
+        self.user32.GetCursorPos(byref(self.point))
+        return self.point.x, self.point.y
+
+# Needs a running QApplication, but works on every platform Qt does
+class QtCursor(object):
+    def position(self):
+        pos = QtGui.QCursor.pos()
+        return pos.x(), pos.y()
+
+# Plays back a list of (x, y) samples, one per call.  Holds the last sample
+# once the trace runs out unless asked to loop.
+class TraceCursor(object):
+    def __init__(self, samples, loop=False):
+        self.samples = samples
+        self.loop = loop
+        self.index = 0
+
+    def finished(self):
+        return not self.loop and self.index >= len(self.samples)
+
+    def position(self):
+        if self.index >= len(self.samples):
+            if not self.loop:
+                return self.samples[-1]
+            self.index = 0
+        sample = self.samples[self.index]
+        self.index += 1
+        return sample
+
+# Computes each sample from the tick number with path(tick) -> (x, y)
+class ScriptedCursor(object):
+    def __init__(self, path):
+        self.path = path
+        self.tick = 0
+
+    def position(self):
+        pos = self.path(self.tick)
+        self.tick += 1
+        return pos
+
+# Wraps another cursor source for a board that polls once per frame.  poll()
+# reads the source and works out the cursor's velocity in pixels per second
+# and when it last moved; position() hands back the cached sample, so the
+# Stepper reading it costs nothing more.
+class TrackedCursor(object):
+    def __init__(self, source, clock=time.time):
+        self.source = source
+        self.clock = clock
+        self.x = self.y = None
+        self.xVelocity = self.yVelocity = 0.0
+        self.sampled = None
+        self.moved = clock()
+
+    # Returns True when the cursor moved since the last poll
+    def poll(self):
+        x, y = self.source.position()
+        now = self.clock()
+        moved = (x, y) != (self.x, self.y)
+        if self.sampled is not None and now > self.sampled:
+            self.xVelocity = (x - self.x)/(now - self.sampled) if moved else 0.0
+            self.yVelocity = (y - self.y)/(now - self.sampled) if moved else 0.0
+        if moved:
+            self.moved = now
+        self.x, self.y = x, y
+        self.sampled = now
+        return moved
+
+    def position(self):
+        if self.sampled is None:
+            self.poll()
+        return self.x, self.y
+
+    def speed(self):
+        return math.hypot(self.xVelocity, self.yVelocity)
+
+    # Seconds since the cursor last moved
+    def stillFor(self):
+        return self.clock() - self.moved
+
+def circlePath(xCenter, yCenter, radius, period):
+    def path(tick):
+        angle = 2*math.pi*tick/period
+        return xCenter + radius*math.cos(angle), yCenter + radius*math.sin(angle)
+    return path
+
+# Walks the closed polygon through waypoints at a constant speed in pixels per tick
+def waypointPath(waypoints, speed):
+    legs = []
+    total = 0
+    for i, start in enumerate(waypoints):
+        end = waypoints[(i + 1) % len(waypoints)]
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        legs.append((total, length, start, end))
+        total += length
+    def path(tick):
+        if not total:
+            return waypoints[0]
+        travelled = (tick*speed) % total
+        for offset, length, start, end in legs:
+            if length and travelled <= offset + length:
+                t = (travelled - offset)/length
+                return (start[0] + (end[0] - start[0])*t,
+                        start[1] + (end[1] - start[1])*t)
+        return waypoints[0]
+    return path
+
+def defaultCursor():
+    try:
+        return WindowsCursor()
+    except ImportError:
+        return QtCursor()
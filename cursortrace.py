@@ -0,0 +1,168 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import sys, time
+
+import numpy
+
+from cursor import defaultCursor
+from dasher import Dasher
+from follower import Follower
+from orbiter import Orbiter
+from stepper import Stepper
+
+# A trace file is MAGIC followed by fixed-width little-endian records, one per
+# cursor sample, so it can be memory-mapped straight into a record array.
+MAGIC = b'CURTRC01'
+TRACE_DTYPE = numpy.dtype([('t', '<f8'), ('x', '<i4'), ('y', '<i4')])
+
+# Samples recorded before they are appended to the file
+FLUSH_EVERY = 1024
+
+GOLDEN_SEED = 1
+GOLDEN_FOLLOWERS = 32
+GOLDEN_DASHERS = 8
+GOLDEN_ORBITERS = 8
+GOLDEN_TOLERANCE = 1e-6
+
+def loadTrace(path):
+    return numpy.memmap(path, dtype=TRACE_DTYPE, mode='r', offset=len(MAGIC))
+
+# Wraps another cursor source and writes every sample it hands out to path,
+# timestamped in seconds since the first one.
+class TraceRecorder(object):
+    def __init__(self, cursor, path):
+        self.cursor = cursor
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.samples = []
+        self.start = None
+
+    def position(self):
+        x, y = self.cursor.position()
+        now = time.time()
+        if self.start is None:
+            self.start = now
+        self.samples.append((now - self.start, x, y))
+        if len(self.samples) >= FLUSH_EVERY:
+            self.flush()
+        return x, y
+
+    def flush(self):
+        numpy.array(self.samples, dtype=TRACE_DTYPE).tofile(self.file)
+        self.file.flush()
+        self.samples = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Cursor source that plays a trace back.  Fast replay hands out one sample per
+# call; realtime replay hands out whichever sample was current at the wall
+# clock time since the first call.
+class ReplayCursor(object):
+    def __init__(self, trace, realtime=False):
+        self.trace = trace
+        self.realtime = realtime
+        self.index = 0
+        self.start = None
+
+    def position(self):
+        if self.realtime:
+            now = time.time()
+            if self.start is None:
+                self.start = now
+            wanted = self.trace['t'][0] + now - self.start
+            self.index = max(0, numpy.searchsorted(self.trace['t'], wanted, 'right') - 1)
+            sample = self.trace[self.index]
+        else:
+            sample = self.trace[min(self.index, len(self.trace) - 1)]
+            self.index += 1
+        return int(sample['x']), int(sample['y'])
+
+    def finished(self):
+        if self.realtime:
+            return self.index >= len(self.trace) - 1
+        return self.index >= len(self.trace)
+
+# Flattens the simulation state of every piece into one array for golden-output
+# comparisons.
+def snapshot(pieces):
+    state = []
+    for piece in pieces:
+        if isinstance(piece, Follower):
+            state.extend((piece.x, piece.y, piece.heading, piece.movement, piece.state))
+        elif isinstance(piece, Dasher):
+            state.extend(piece.xPlace)
+            state.extend(piece.yPlace)
+            state.append(piece.pointer)
+        elif isinstance(piece, Orbiter):
+            state.append(piece.angle)
+    return numpy.array(state, dtype=numpy.float64)
+
+# Largest absolute difference between a replayed state and a golden one, or
+# infinity when they do not even hold the same pieces.  Compared as it is
+# against GOLDEN_TOLERANCE, with no relative slack for large coordinates.
+def goldenDeviation(state, golden):
+    if state.shape != golden.shape:
+        return numpy.inf
+    return numpy.abs(state - golden).max() if len(state) else 0.0
+
+# The fixed mixed population golden runs are recorded against.  random is
+# seeded before anything is built, so a trace always replays the same way.
+def goldenStepper(cursor, seed=GOLDEN_SEED):
+    stepper = Stepper(cursor, seed=seed)
+    stepper.spawnFollowers(GOLDEN_FOLLOWERS, 800, 600)
+    stepper.spawnDashers(GOLDEN_DASHERS)
+    stepper.spawnOrbiters(GOLDEN_ORBITERS)
+    return stepper
+
+def replay(trace, seed=GOLDEN_SEED, realtime=False, tps=45):
+    cursor = ReplayCursor(trace, realtime)
+    stepper = goldenStepper(cursor, seed)
+    while not cursor.finished():
+        stepper.tick()
+        if realtime:
+            time.sleep(1/tps)
+    return stepper
+
+def record(path, seconds, tps=45):
+    recorder = TraceRecorder(defaultCursor(), path)
+    for i in range(int(seconds*tps)):
+        recorder.position()
+        time.sleep(1/tps)
+    recorder.close()
+
+def main():
+    usage = ("usage: cursortrace.py record TRACE SECONDS | replay TRACE [GOLDEN [TICKS]] | golden TRACE GOLDEN [TICKS]\n"
+             "TICKS replays only the start of the trace.  The flock is chaotic, so a replay only\n"
+             "matches a golden recorded before a rounding-level change for a short, trace-dependent\n"
+             "stretch; test_flock.py checks such changes step by step instead")
+    if len(sys.argv) < 3:
+        sys.exit(usage)
+    command, path = sys.argv[1], sys.argv[2]
+    ticks = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    if command == 'record':
+        from PySide import QtGui
+        app = QtGui.QApplication(sys.argv)
+        record(path, float(sys.argv[3]) if len(sys.argv) > 3 else 10)
+    elif command == 'golden':
+        numpy.save(sys.argv[3], snapshot(replay(loadTrace(path)[:ticks]).pieces))
+    elif command == 'replay':
+        state = snapshot(replay(loadTrace(path)[:ticks]).pieces)
+        if len(sys.argv) > 3:
+            golden = numpy.load(sys.argv[3])
+            if golden.shape != state.shape:
+                sys.exit("replay diverged from %s: different pieces" % sys.argv[3])
+            deviation = goldenDeviation(state, golden)
+            if deviation > GOLDEN_TOLERANCE:
+                sys.exit("replay diverged from %s by up to %g" % (sys.argv[3], deviation))
+            print("replay matches %s to within %g" % (sys.argv[3], deviation))
+    else:
+        sys.exit(usage)
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,14 @@
 
 from __future__ import division
 
-import math
 import sys, random
 
-from ctypes import windll, Structure, c_long, byref
-
 from PySide import QtCore, QtGui
 
-class POINT(Structure):
-    _fields_ = [("x", c_long), ("y", c_long)]
+from cursor import defaultCursor
+from dasher import DasherBatch
+from dirty import DirtyRegion
+from metrics import Metrics, Hud, HUD_RECT
 
 SQUARE_SIZE = 3
 
@@ -29,15 +28,6 @@ STATE_NORMAL = 0
 STATE_TURN_LEFT = -1
 STATE_TURN_RIGHT = 1
 
-HIST = 3
-HIST_FADE = 125
-
-def queryMousePosition():
-    pt = POINT()
-    windll.user32.GetCursorPos(byref(pt))
-    return { "x": pt.x, "y": pt.y}
-
-
 class Communicate(QtCore.QObject):
     
     msgToSB = QtCore.Signal(str)
@@ -80,10 +70,15 @@ class Board(QtGui.QFrame):
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
 
         self.timer = QtCore.QBasicTimer()
+        self.dirty = DirtyRegion()
+        self.dashers = DasherBatch(NUM_BIOTS)
+        self.metrics = Metrics()
+        self.dashers.metrics = self.metrics
+        self.hud = Hud(self.metrics)
         self.pieces = []
         
         for i in range(NUM_BIOTS):
-            self.curPiece = Dasher()
+            self.curPiece = self.dashers.spawn()
             self.curPiece.x = random.randint(0, self.frameRect().width())
             self.curPiece.y = random.randint(0, self.frameRect().height())
             self.pieces.append(self.curPiece)
@@ -97,6 +92,7 @@ class Board(QtGui.QFrame):
         self.isPaused = False
 
         self.target = QtCore.QPointF(5, 10)
+        self.cursor = defaultCursor()
         
     def start(self):
         if self.isPaused:
@@ -130,6 +126,10 @@ class Board(QtGui.QFrame):
         if key == QtCore.Qt.Key_P:
             self.pause()
             return
+        if key == QtCore.Qt.Key_H:
+            self.hud.toggle()
+            self.update(HUD_RECT)
+            return
         if self.isPaused:
             return
         elif key == QtCore.Qt.Key_D:
@@ -140,13 +140,15 @@ class Board(QtGui.QFrame):
     def timerEvent(self, event):
         #print ".",
 
-        pos = queryMousePosition()
+        self.metrics.start()
+        x, y = self.cursor.position()
+        self.metrics.lap('cursor')
         try:
-            self.target.setX(pos["x"])
+            self.target.setX(x)
         except OverflowError as e:
             self.target.setX(0)
         try:
-            self.target.setY(pos["y"])
+            self.target.setY(y)
         except OverflowError as e:
             self.target.setY(0)
 
@@ -163,12 +165,16 @@ class Board(QtGui.QFrame):
         #yAvg = sum([piece.y for piece in self.pieces])/len(self.pieces)
 
 
-        for piece in self.pieces:
-            piece.navigate(self.target)
+        self.dashers.navigate(self.target)
+        self.metrics.tick()
+        self.metrics.frame()
 
-        self.update()
+        self.dirty.repaint(self, self.dashers.bounds())
+        if self.hud.update():
+            self.update(HUD_RECT)
 
     def paintEvent(self, event):
+        self.metrics.start()
         painter = QtGui.QPainter(self)
         rect = self.contentsRect()
 
@@ -177,68 +183,9 @@ class Board(QtGui.QFrame):
             x = piece.x
             y = piece.y
             piece.draw(painter, self.target)
-
-class Dasher(object):
-
-    def __init__(self):
-        self.state = STATE_NORMAL
-        self.target = QtCore.QPointF(0, 0)
-        self.x = 0
-        self.y = 0
-        self.xOld = 0
-        self.yOld = 0
-        self.xPlace = [0]*HIST
-        self.yPlace = [0]*HIST
-        self.pointer = 0
-        self.color = QtGui.QColor(random.choice([0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
-                      0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]))
-
-        self.countOfUpdateVectorsSinceFinalizing = 0
-        
-    def distanceToSquare(self, other):
-        return (other.x-self.x)**2+(other.y-self.y)**2
-
-    def crossesCenter(self, target, radius):
-        p1 = (self.xPlace[self.pointer], self.yPlace[self.pointer])
-        p2 = (self.xPlace[self.pointer-1], self.yPlace[self.pointer-1])
-        c = (target.x()-32, target.y())
-        dist = math.sqrt((p2[0] - p1[0])*(p2[0] - p1[0]) + (p2[1] - p1[1])*(p2[1] - p1[1]))
-
-        if dist:
-            distMin = abs(((c[0] - p1[0]) * (p2[1] - p1[1]) - (c[1] - p1[1]) * (p2[0] - p1[0])) / dist)
-            if distMin <= radius:
-                return True
-        return False
-
-
-    def navigate(self, target):
-        self.xOld = self.x
-        self.yOld = self.y
-
-        self.pointer = (self.pointer + 1) % HIST        
-
-        # Only try ten times to find a nice route.  Could otherwise hang with long movements
-        x = 50
-        while x:
-            heading = random.randint(0, 360)*math.pi/180
-            self.xPlace[self.pointer] = target.x() - 32 + math.cos(heading)*DISTANCE_AVERSION/10
-            self.yPlace[self.pointer] = target.y() + math.sin(heading)*DISTANCE_AVERSION/10
-            #self.x = target.x() + math.cos(heading)*DISTANCE_AVERSION/10-32
-            #self.y = target.y() + math.sin(heading)*DISTANCE_AVERSION/10
-            if not self.crossesCenter(target, 15):
-                break
-            x-= 1
-
-    def draw(self, painter, target):
-        color = self.color
-        painter.setPen(color)
-        for i in range(len(self.xPlace)):
-            idx = (self.pointer+i) % HIST
-            painter.drawLine(self.xPlace[idx], self.yPlace[idx],
-                             self.xPlace[idx-1], self.yPlace[idx-1])
-            color = color.lighter(HIST_FADE)
-            painter.setPen(color)
-        #painter.drawLine(self.x, self.y, self.xOld, self.yOld)
+        self.hud.draw(painter)
+        painter.end()
+        self.metrics.lap('paint')
 
 def main():
     
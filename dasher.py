@@ -1,33 +1,253 @@
+from __future__ import division
+
 from PySide import QtCore, QtGui
 
 import math, random
 
+import numpy
+
+from follower import rowAttribute
+from metrics import NO_METRICS
+
 HIST = 3
 HIST_FADE = 125
 DISTANCE_AVERSION = 25*25
 
+# Dashers jump to a random point on a circle around a spot left of the cursor,
+# but never along a line that passes within DASH_CLEARANCE of its centre
+DASH_OFFSET = 32
+DASH_RADIUS = DISTANCE_AVERSION/10
+DASH_CLEARANCE = 15
+# Candidate headings tried per dasher per tick, drawn DASH_ROUND at a time
+DASH_TRIES = 50
+DASH_ROUND = 8
+
+colorTable = [0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
+              0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]
+
+fadePalettes = {}
+
+# Pens for every segment of a trail, each HIST_FADE lighter than the one
+# before, built once per (color, depth)
+def fadePalette(color, depth):
+    key = (color.rgba(), depth)
+    if key not in fadePalettes:
+        pens = []
+        for i in range(depth):
+            pens.append(QtGui.QPen(color))
+            color = color.lighter(HIST_FADE)
+        fadePalettes[key] = pens
+    return fadePalettes[key]
+
+# Struct-of-arrays state for a group of Dashers, stepped together by
+# navigate().  The Dashers handed out by spawn() are views onto one row.
+# Trails live in one (capacity, depth) ring buffer per axis, each row with its
+# own write pointer.
+class DasherBatch(object):
+
+    def __init__(self, capacity=16, depth=HIST):
+        self.depth = depth
+        # Rows of each color, for drawing; rebuilt when colors change
+        self.groups = None
+        self.count = 0
+        self.capacity = 0
+        self.views = []
+        self.colors = []
+        # Seeded from random so a seeded run stays reproducible
+        self.random = numpy.random.RandomState(random.getrandbits(32))
+        # Where navigate() reports how many candidate headings it threw away
+        self.metrics = NO_METRICS
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.xOld = numpy.zeros(0)
+        self.yOld = numpy.zeros(0)
+        self.pointer = numpy.zeros(0, dtype=numpy.intp)
+        self.xPlace = numpy.zeros((0, depth))
+        self.yPlace = numpy.zeros((0, depth))
+        self.reserve(capacity)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name in ('x', 'y', 'xOld', 'yOld', 'pointer', 'xPlace', 'yPlace'):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def spawn(self, color=None):
+        if self.count == self.capacity:
+            self.reserve(max(16, self.capacity*2))
+        i = self.count
+        self.count += 1
+        self.x[i] = self.y[i] = self.xOld[i] = self.yOld[i] = 0
+        self.pointer[i] = 0
+        self.xPlace[i] = 0
+        self.yPlace[i] = 0
+        if color is None:
+            color = QtGui.QColor(random.choice(colorTable))
+        self.colors.append(color)
+        self.groups = None
+        view = Dasher(self, i)
+        self.views.append(view)
+        return view
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views)
+
+    # Draws candidate headings DASH_ROUND at a time for every dasher still
+    # looking and keeps the first whose jump clears the centre.  After
+    # DASH_TRIES candidates a dasher keeps its last one, which is what
+    # Dasher.navigate's retry loop settles on.  Nearly every dasher is done
+    # after the first round, and there are never more than
+    # DASH_TRIES/DASH_ROUND rounds.
+    def navigate(self, target):
+        n = self.count
+        if not n:
+            return
+        self.xOld[:n] = self.x[:n]
+        self.yOld[:n] = self.y[:n]
+        pointer = (self.pointer[:n] + 1) % self.depth
+        self.pointer[:n] = pointer
+        rows = numpy.arange(n)
+        xPrevious = self.xPlace[rows, pointer - 1]
+        yPrevious = self.yPlace[rows, pointer - 1]
+
+        xCenter = target.x() - DASH_OFFSET
+        yCenter = target.y()
+        looking = rows
+        tries = 0
+        candidates = 0
+        while len(looking) and tries < DASH_TRIES:
+            k = min(DASH_ROUND, DASH_TRIES - tries)
+            tries += k
+            heading = numpy.radians(self.random.randint(0, 361, (len(looking), k)))
+            xCandidate = xCenter + numpy.cos(heading)*DASH_RADIUS
+            yCandidate = yCenter + numpy.sin(heading)*DASH_RADIUS
+
+            # Distance from the centre to the line through the old and new points
+            xStep = xPrevious[looking][:, None] - xCandidate
+            yStep = yPrevious[looking][:, None] - yCandidate
+            dist = numpy.hypot(xStep, yStep)
+            cross = numpy.abs((xCenter - xCandidate)*yStep - (yCenter - yCandidate)*xStep)
+            clear = (dist == 0) | (cross > DASH_CLEARANCE*dist)
+
+            found = clear.any(axis=1)
+            choice = numpy.where(found, clear.argmax(axis=1), k - 1)
+            candidates += choice.sum() + len(looking)
+            picked = numpy.arange(len(looking))
+            self.xPlace[looking, pointer[looking]] = xCandidate[picked, choice]
+            self.yPlace[looking, pointer[looking]] = yCandidate[picked, choice]
+            looking = looking[~found]
+        self.metrics.count('dashRetries', candidates - n)
+
+    # Where each dasher is now: the newest point of its trail
+    def positions(self):
+        n = self.count
+        rows = numpy.arange(n)
+        pointer = self.pointer[:n]
+        return self.xPlace[rows, pointer], self.yPlace[rows, pointer]
+
+    # (n, 4) array of left, top, right, bottom around every trail
+    def bounds(self):
+        n = self.count
+        return numpy.column_stack((self.xPlace[:n].min(axis=1), self.yPlace[:n].min(axis=1),
+                                   self.xPlace[:n].max(axis=1), self.yPlace[:n].max(axis=1)))
+
+    def colorGroups(self):
+        if self.groups is None:
+            groups = {}
+            for i, color in enumerate(self.colors[:self.count]):
+                groups.setdefault(color.rgba(), (color, []))[1].append(i)
+            self.groups = [(color, numpy.array(rows)) for color, rows in groups.values()]
+        return self.groups
+
+    # Segment i of every trail runs from slot pointer+i to the slot before it,
+    # as in Dasher.draw.  Each (color, segment) pair is one pen change and one
+    # drawLines call however many dashers there are.  Dashers jump rather than
+    # glide, so there is nothing to interpolate and alpha is ignored.  rows, if
+    # given, picks the dashers to draw.
+    def draw(self, painter, target, alpha=1.0, rows=None):
+        depth = self.depth
+        shown = None
+        if rows is not None:
+            shown = numpy.zeros(self.count, dtype=bool)
+            shown[rows] = True
+        for color, group in self.colorGroups():
+            if shown is not None:
+                group = group[shown[group]]
+                if not len(group):
+                    continue
+            pens = fadePalette(color, depth)
+            pointer = self.pointer[group]
+            xPlace = self.xPlace[group]
+            yPlace = self.yPlace[group]
+            picked = numpy.arange(len(group))
+            for i in range(depth):
+                start = (pointer + i) % depth
+                end = (start - 1) % depth
+                lines = map(QtCore.QLineF,
+                            xPlace[picked, start].tolist(), yPlace[picked, start].tolist(),
+                            xPlace[picked, end].tolist(), yPlace[picked, end].tolist())
+                painter.setPen(pens[i])
+                painter.drawLines(list(lines))
+
+# A Dasher is a view over one row of a DasherBatch.  Constructed on its own it
+# gets a private single-dasher batch.
 class Dasher(object):
-    def __init__(self):
+    def __init__(self, batch=None, index=None):
+        if batch is None:
+            batch = DasherBatch(1)
+            batch.spawn()
+            index = 0
+        self.batch = batch
+        self.index = index
         self.target = QtCore.QPointF(0, 0)
-        self.x = 0
-        self.y = 0
-        self.xOld = 0
-        self.yOld = 0
-        self.xPlace = [0]*HIST
-        self.yPlace = [0]*HIST
-        self.pointer = 0
-        self.color = QtGui.QColor(random.choice([0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
-                      0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]))
 
         self.countOfUpdateVectorsSinceFinalizing = 0
-        
+
+    x = rowAttribute('x', owner='batch')
+    y = rowAttribute('y', owner='batch')
+    xOld = rowAttribute('xOld', owner='batch')
+    yOld = rowAttribute('yOld', owner='batch')
+    pointer = rowAttribute('pointer', int, owner='batch')
+
+    @property
+    def xPlace(self):
+        return self.batch.xPlace[self.index]
+
+    @xPlace.setter
+    def xPlace(self, value):
+        self.batch.xPlace[self.index] = value
+
+    @property
+    def yPlace(self):
+        return self.batch.yPlace[self.index]
+
+    @yPlace.setter
+    def yPlace(self, value):
+        self.batch.yPlace[self.index] = value
+
+    @property
+    def color(self):
+        return self.batch.colors[self.index]
+
+    @color.setter
+    def color(self, value):
+        self.batch.colors[self.index] = value
+        self.batch.groups = None
+
     def distanceToSquare(self, other):
         return (other.x-self.x)**2+(other.y-self.y)**2
 
     def crossesCenter(self, target, radius):
         p1 = (self.xPlace[self.pointer], self.yPlace[self.pointer])
         p2 = (self.xPlace[self.pointer-1], self.yPlace[self.pointer-1])
-        c = (target.x()-32, target.y())
+        c = (target.x()-DASH_OFFSET, target.y())
         dist = math.sqrt((p2[0] - p1[0])*(p2[0] - p1[0]) + (p2[1] - p1[1])*(p2[1] - p1[1]))
 
         if dist:
@@ -41,27 +261,29 @@ class Dasher(object):
         self.xOld = self.x
         self.yOld = self.y
 
-        self.pointer = (self.pointer + 1) % HIST        
+        self.pointer = (self.pointer + 1) % self.batch.depth
 
         # Only try ten times to find a nice route.  Could otherwise hang with long movements
-        x = 50
+        x = DASH_TRIES
         while x:
             heading = random.randint(0, 360)*math.pi/180
-            self.xPlace[self.pointer] = target.x() - 32 + math.cos(heading)*DISTANCE_AVERSION/10
-            self.yPlace[self.pointer] = target.y() + math.sin(heading)*DISTANCE_AVERSION/10
+            self.xPlace[self.pointer] = target.x() - DASH_OFFSET + math.cos(heading)*DASH_RADIUS
+            self.yPlace[self.pointer] = target.y() + math.sin(heading)*DASH_RADIUS
             #self.x = target.x() + math.cos(heading)*DISTANCE_AVERSION/10-32
             #self.y = target.y() + math.sin(heading)*DISTANCE_AVERSION/10
-            if not self.crossesCenter(target, 15):
+            if not self.crossesCenter(target, DASH_CLEARANCE):
                 break
             x-= 1
 
+    def bounds(self):
+        return min(self.xPlace), min(self.yPlace), max(self.xPlace), max(self.yPlace)
+
     def draw(self, painter, target):
-        color = self.color
-        painter.setPen(color)
-        for i in range(len(self.xPlace)):
-            idx = (self.pointer+i) % HIST
+        depth = self.batch.depth
+        pens = fadePalette(self.color, depth)
+        for i in range(depth):
+            idx = (self.pointer+i) % depth
+            painter.setPen(pens[i])
             painter.drawLine(self.xPlace[idx], self.yPlace[idx],
                              self.xPlace[idx-1], self.yPlace[idx-1])
-            color = color.lighter(HIST_FADE)
-            painter.setPen(color)
         #painter.drawLine(self.x, self.y, self.xOld, self.yOld)
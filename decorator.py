@@ -3,59 +3,42 @@
 
 from __future__ import division
 
-from dasher import Dasher
-from follower import Follower
-from orbiter import Orbiter
-from orbiter import sol
+from clock import FixedStep, FrameBudget, IdleThrottle, ACTIVE, IDLE, FROZEN
+from cursor import TrackedCursor, defaultCursor
+from dirty import DirtyRegion
+from flock import DETAIL_SPARSE
+from metrics import Metrics, MetricsLog, Hud, HUD_RECT
+from scene import Scene, loadScene
+from stepper import Stepper, visibleRows
 
-import math
-import sys, random
-
-from ctypes import windll, Structure, c_long, byref
+import sys, time
 
 from PySide import QtCore, QtGui
 
-class POINT(Structure):
-    _fields_ = [("x", c_long), ("y", c_long)]
-
-NUM_BIOTS = 8
-TPS = 45
-TICK_SPEED = 1000/TPS
-
-def queryMousePosition():
-    pt = POINT()
-    windll.user32.GetCursorPos(byref(pt))
-    return { "x": pt.x, "y": pt.y}
-
 
 class Communicate(QtCore.QObject):
     
     msgToSB = QtCore.Signal(str)
 
+# A window over one screen.  The board of the first one runs the simulation
+# in desktop coordinates; boards given it as their lead only paint the part of
+# it on their own screen, so no backing store is bigger than one screen.
 class BiOverlay(QtGui.QMainWindow):
     
-    def __init__(self):
+    def __init__(self, board=None, scene=None, geometry=None, lead=None, metricsPath=None):
         super(BiOverlay, self).__init__()
+        self.scene = Scene() if scene is None else scene
+        # File the board logs its performance summaries to, if any
+        self.metricsPath = metricsPath
 
-        desktop = QtGui.QApplication.desktop()
-        cScreens = desktop.screenCount()
-
-        if cScreens == 1:
-            self.setGeometry(QtGui.QDesktopWidget().availableGeometry())
-        elif cScreens == 2:
-            self.setGeometry(desktop.availableGeometry(0).united(desktop.availableGeometry(1)))
-        else:
-            rect = desktop.availableGeometry(0)
-            for i in range(1, cScreens):
-                rect = rect.united(desktop.availableGeometry(i))
-            self.setGeometry(rect)
-
-        self.offset = self.geometry().left()
+        if geometry is None:
+            geometry = QtGui.QDesktopWidget().availableGeometry()
+        self.setGeometry(geometry)
 
         self.setMouseTracking(True)
 
         self.setWindowTitle('Biot Overlay')
-        self.overlay = Board(self)
+        self.overlay = (Board if board is None else board)(self, lead)
 
         self.setCentralWidget(self.overlay)
             
@@ -68,73 +51,193 @@ class BiOverlay(QtGui.QMainWindow):
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
         
 
+# One BiOverlay per screen, all showing the simulation of the first
+def screenOverlays(board=None, scene=None, metricsPath=None):
+    desktop = QtGui.QApplication.desktop()
+    overlays = []
+    for i in range(desktop.screenCount()):
+        lead = overlays[0].overlay if overlays else None
+        overlays.append(BiOverlay(board, scene, desktop.availableGeometry(i), lead,
+                                  metricsPath if lead is None else None))
+    return overlays
+
+# Takes --metrics PATH out of the command line arguments args and returns
+# PATH, or None when it is not there
+def metricsOption(args):
+    if '--metrics' not in args:
+        return None
+    i = args.index('--metrics')
+    if i + 1 >= len(args):
+        sys.exit("--metrics needs a PATH")
+    path = args[i + 1]
+    del args[i:i + 2]
+    return path
+
 class Board(QtGui.QFrame):
-    Speed = TICK_SPEED
 
-    def __init__(self, parent):
+    def __init__(self, parent, lead=None):
         super(Board, self).__init__()
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
-
+        # Takes keys, for the HUD
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+
+        # The part of the desktop this board shows, in desktop coordinates
+        self.screen = QtCore.QRect(parent.geometry())
+        self.dirty = DirtyRegion()
+        self.frameCost = 0
+        self.lead = self if lead is None else lead
+        if lead is not None:
+            lead.screens.append(self)
+            lead.confined = False
+            self.stepper = lead.stepper
+            self.clock = lead.clock
+            self.metrics = lead.metrics
+            self.hud = lead.hud
+            return
+        self.screens = [self]
+
+        # Which agents run, and how fast, comes from the scene
+        scene = self.scene = parent.scene
+        self.tps = scene.tps
         self.timer = QtCore.QBasicTimer()
-        self.pieces = []
-        
-        for i in range(NUM_BIOTS):
-            #self.curPiece = Dasher()
-            #self.curPiece = Orbiter()
-            self.curPiece = Follower()
-            self.curPiece.x = random.randint(0, self.frameRect().width())
-            self.curPiece.y = random.randint(0, self.frameRect().height())
-            self.pieces.append(self.curPiece)
-        #self.pieces = sol
+        self.clock = FixedStep(scene.tps)
+        self.throttle = IdleThrottle(scene.idleAfter, scene.freezeAfter)
+        # Polled once per frame here; the stepper reads the cached sample
+        self.cursor = TrackedCursor(defaultCursor())
+        self.metrics = Metrics()
+        self.hud = Hud(self.metrics, MetricsLog(parent.metricsPath) if parent.metricsPath else None)
+        QtGui.QApplication.instance().aboutToQuit.connect(self.hud.close)
+        self.simulate(scene)
             
         self.curX = 0
         self.curY = 0
 
-        self.offset = parent.offset
-
-        self.target = QtCore.QPointF(5, 10)
+    # Sets up what steps the scene's agents: here a Stepper on the GUI thread,
+    # in desktop coordinates, with the agents spawned on this board's screen
+    def simulate(self, scene):
+        self.stepper = Stepper(self.cursor)
+        screen = self.screen
+        scene.populate(self.stepper, screen.width(), screen.height(), screen.left(), screen.top())
+        # The other screens' boards join before the first frame, which keeps
+        # the followers on all of them
+        self.confined = False
+        self.stepper.setMetrics(self.metrics)
+        self.budget = FrameBudget(scene.fps, self.stepper.flock.count, scene.minFps,
+                                  min(1, self.stepper.flock.count), DETAIL_SPARSE)
+        self.pieces = self.stepper.pieces
+        self.target = self.stepper.target
         
     def start(self):
-        self.timer.start(Board.Speed, self)
+        if self.lead is not self:
+            return
+        # The timer paces frames; the clock decides how many ticks each one gets
+        self.timer.start(int(1000/self.budget.fps), self)
 
     def timerEvent(self, event):
         #print ".",
 
-        pos = queryMousePosition()
-        try:
-            self.target.setX(pos["x"] - self.offset)
-        except OverflowError as e:
-            self.target.setX(0)
-        try:
-            self.target.setY(pos["y"])
-        except OverflowError as e:
-            self.target.setY(0)
-
         if event.timerId() == self.timer.timerId():
             self.moveTowardsTarget()
         else:
             QtGui.QFrame.timerEvent(self, event)
 
-    def moveTowardsTarget(self):
-        # only used for followers
-        xAvg = sum([piece.x for piece in self.pieces])/len(self.pieces)
-        yAvg = sum([piece.y for piece in self.pieces])/len(self.pieces)
+    # Keeps the followers on the screens of every board sharing the simulation
+    def confine(self):
+        self.scene.confine(self.stepper, [board.screen for board in self.screens])
+        self.confined = True
 
-        for piece in self.pieces:
-            piece.navigate(xAvg, yAvg, self.target, self.pieces)
+    def keyPressEvent(self, event):
+        key = event.key()
+
+        if key == QtCore.Qt.Key_H:
+            self.hud.toggle()
+            for board in self.lead.screens:
+                board.refreshHud()
+        else:
+            QtGui.QFrame.keyPressEvent(self, event)
+
+    def refreshHud(self):
+        self.update(HUD_RECT)
+
+    def moveTowardsTarget(self):
+        if not self.confined:
+            self.confine()
+        self.metrics.start()
+        moved = self.cursor.poll()
+        self.metrics.lap('cursor')
+        if self.throttle.update(moved, self.cursor.stillFor()):
+            self.pace()
+        if self.throttle.mode == FROZEN:
+            return
+        # Idle frames are cheap by design and say nothing about the budget
+        if self.throttle.mode == ACTIVE and self.budget.record(self.frameCost):
+            self.adapt()
+        start = time.time()
+
+        steps = self.clock.advance()
+        if steps:
+            self.stepper.step(steps)
+
+        boxes = self.stepper.bounds()
+        for board in self.screens:
+            board.repaintAgents(boxes)
+        self.frameCost = time.time() - start
+
+        self.metrics.frame()
+        flock = self.stepper.flock
+        if self.hud.update({'detail': flock.detail, 'population': flock.count, 'mode': self.throttle.mode}):
+            for board in self.screens:
+                board.refreshHud()
+
+    # Repaints the tiles under the boxes, in desktop coordinates, that fall on
+    # this board's screen
+    def repaintAgents(self, boxes):
+        left, top = self.screen.left(), self.screen.top()
+        inside = visibleRows(boxes, self.screen)
+        self.dirty.repaint(self, boxes[inside] - (left, top, left, top))
+
+    # Tick and frame rate for the throttle's mode
+    def pace(self):
+        mode = self.throttle.mode
+        self.clock.reset()
+        if mode == ACTIVE:
+            self.clock.setTps(self.tps)
+            self.timer.start(int(1000/self.budget.fps), self)
+        elif mode == IDLE:
+            self.clock.setTps(self.throttle.idleTps)
+            self.timer.start(int(1000/self.throttle.idleTps), self)
+        else:
+            self.timer.start(int(1000/self.throttle.pollFps), self)
 
-        self.update()
+    def adapt(self):
+        self.timer.start(int(1000/self.budget.fps), self)
+        self.stepper.setDetail(self.budget.detail)
+        screen = self.screen
+        self.stepper.resizeFollowers(self.budget.population, screen.width(), screen.height(),
+                                     screen.left(), screen.top())
 
     def paintEvent(self, event):
+        start = time.time()
+        self.metrics.start()
         painter = QtGui.QPainter(self)
-        for i, piece in enumerate(self.pieces):
-            piece.draw(painter, self.target)
+        painter.translate(-self.screen.left(), -self.screen.top())
+        self.stepper.draw(painter, self.clock.alpha(), self.screen)
+        painter.resetTransform()
+        self.hud.draw(painter)
+        painter.end()
+        self.metrics.lap('paint')
+        self.lead.frameCost += time.time() - start
 
 def main():
     
     app = QtGui.QApplication(sys.argv)
-    t = BiOverlay()
-    t.show()
+    # Optional scene file as the first argument, see scenes/, and
+    # --metrics PATH to log performance summaries to PATH
+    args = app.arguments()[1:]
+    metricsPath = metricsOption(args)
+    overlays = screenOverlays(scene=loadScene(args[0]) if args else None, metricsPath=metricsPath)
+    for t in overlays:
+        t.show()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
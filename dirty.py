@@ -0,0 +1,67 @@
+from __future__ import division
+
+from PySide import QtCore, QtGui
+
+import numpy
+
+# Damage is tracked in square tiles rather than one rect per agent, so a
+# flock of thousands coalesces into a few dozen rects per frame.
+TILE_SIZE = 32
+# Slack around every box for pen widths and rounding
+DIRTY_MARGIN = 2
+# Past this fraction of the widget a plain update() is cheaper
+FULL_REPAINT_FRACTION = 0.5
+
+# Tile keys pack (column, row) into one int64, column in the high half
+KEY_SHIFT = 2**32
+
+# Remembers which tiles were painted last frame and repaints those plus the
+# tiles under this frame's boxes, so agents are erased where they were and
+# drawn where they are.
+class DirtyRegion(object):
+
+    def __init__(self, tileSize=TILE_SIZE, fraction=FULL_REPAINT_FRACTION):
+        self.tileSize = tileSize
+        self.fraction = fraction
+        self.previous = numpy.zeros(0, dtype=numpy.int64)
+
+    # boxes is an (n, 4) array of left, top, right, bottom
+    def tiles(self, boxes):
+        boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+        cells = numpy.floor((boxes + (-DIRTY_MARGIN, -DIRTY_MARGIN, DIRTY_MARGIN, DIRTY_MARGIN))/self.tileSize).astype(numpy.int64)
+        left, top, right, bottom = cells.T
+        # Boxes no bigger than a tile touch at most the tiles of their corners
+        small = (right - left <= 1) & (bottom - top <= 1)
+        keys = [left[small]*KEY_SHIFT + top[small], left[small]*KEY_SHIFT + bottom[small],
+                right[small]*KEY_SHIFT + top[small], right[small]*KEY_SHIFT + bottom[small]]
+        for l, t, r, b in cells[~small]:
+            columns, rows = numpy.meshgrid(numpy.arange(l, r + 1), numpy.arange(t, b + 1))
+            keys.append((columns*KEY_SHIFT + rows).ravel())
+        return numpy.unique(numpy.concatenate(keys))
+
+    # Runs of neighbouring tiles in a column become one rect
+    def region(self, keys):
+        region = QtGui.QRegion()
+        if not len(keys):
+            return region
+        rows = (keys + KEY_SHIFT//2) % KEY_SHIFT - KEY_SHIFT//2
+        columns = (keys - rows) // KEY_SHIFT
+        breaks = numpy.flatnonzero((numpy.diff(columns) != 0) | (numpy.diff(rows) != 1)) + 1
+        starts = numpy.concatenate(([0], breaks))
+        stops = numpy.concatenate((breaks, [len(keys)]))
+        tile = self.tileSize
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            region += QtCore.QRect(int(columns[start])*tile, int(rows[start])*tile,
+                                   tile, (stop - start)*tile)
+        return region
+
+    def repaint(self, widget, boxes):
+        current = self.tiles(boxes)
+        keys = numpy.union1d(self.previous, current)
+        self.previous = current
+
+        rect = widget.rect()
+        if len(keys)*self.tileSize**2 > self.fraction*rect.width()*rect.height():
+            widget.update()
+        else:
+            widget.update(self.region(keys))
@@ -0,0 +1,550 @@
+from __future__ import division
+
+from PySide import QtCore, QtGui
+
+import math, random
+
+import numpy
+
+import kernels
+from grid import SpatialGrid, KEY_SHIFT
+from metrics import NO_METRICS
+from obstaclemap import MAP_REACH, MAP_PUSH
+from sprites import followerAtlas, flatFollowerAtlas
+from follower import (Follower, colorTable,
+                      STATE_NORMAL, STATE_TURN_LEFT, STATE_TURN_RIGHT,
+                      FOCUS_ON_GOAL, FOCUS_ON_COHESION, FOCUS_ON_AVOIDANCE,
+                      DISTANCE_ROOT, MOVEMENT_FACTOR, SQUARE_SIZE)
+
+# Rows of the pairwise distance matrix built at once by the brute-force
+# avoidance scan.  Keeps the temporary at a few MB for large flocks.
+CLEAR_BLOCK = 256
+
+# Running position sums pick up rounding error; recompute them exactly this often
+RESUM_EVERY = 1000
+
+# Neighbourhood for local cohesion when a Flock is given no radius of its own
+COHESION_RADIUS = DISTANCE_ROOT*4
+
+# Levels of detail, from the full look down to the cheapest.  Each level
+# keeps the savings of the ones before it.
+DETAIL_SHADED = 0
+# Sprites without the darker shading arc
+DETAIL_FLAT = 1
+# One square point per agent, stamped into a single image
+DETAIL_POINTS = 2
+# Agents far from the target look for neighbours only every SPARSE_STRIDE ticks
+DETAIL_SPARSE = 3
+SPARSE_RADIUS = DISTANCE_ROOT*8
+SPARSE_STRIDE = 2
+
+def unitVectors(vectorRawX, vectorRawY):
+    divisorUnit = numpy.hypot(vectorRawX, vectorRawY)
+    safe = numpy.where(divisorUnit > 0, divisorUnit, 1)
+    return vectorRawX/safe, vectorRawY/safe, divisorUnit
+
+# Struct-of-arrays state for a whole flock of Followers.  Every per-agent
+# attribute lives in a contiguous array indexed by the agent's row, and
+# navigate() steps all of them at once.  The Followers handed out by spawn()
+# are views onto a single row.
+class Flock(object):
+
+    # With a cohesionRadius each agent steers towards the centroid of its own
+    # neighbours within it, so separate sub-flocks can form.  Without one they
+    # all steer towards the centroid of the whole flock.
+    # The remaining arguments override the tuning constants of follower.py
+    # for this flock only.
+    def __init__(self, capacity=16, cohesionRadius=None,
+                 focusOnGoal=FOCUS_ON_GOAL, focusOnCohesion=FOCUS_ON_COHESION,
+                 focusOnAvoidance=FOCUS_ON_AVOIDANCE, distanceRoot=DISTANCE_ROOT,
+                 movementFactor=MOVEMENT_FACTOR):
+        self.cohesionRadius = cohesionRadius
+        self.focusOnGoal = focusOnGoal
+        self.focusOnCohesion = focusOnCohesion
+        self.focusOnAvoidance = focusOnAvoidance
+        self.distanceRoot = distanceRoot
+        self.movementFactor = movementFactor
+        self.xSum = 0.0
+        self.ySum = 0.0
+        self.ticks = 0
+        self.grid = SpatialGrid(distanceRoot)
+        # Agents of other species to steer clear of, rebuilt every tick
+        self.obstacles = SpatialGrid(distanceRoot)
+        # Cross-check every grid query against the brute-force scan
+        self.checkGrid = False
+        # Step through the fused loops of kernels.py rather than numpy
+        self.compiled = kernels.COMPILED
+        # Where navigate() reports its phase timings and neighbour checks
+        self.metrics = NO_METRICS
+        self.detail = DETAIL_SHADED
+        # Every agent's color as an ARGB32 pixel, for drawing points; rebuilt
+        # when colors change
+        self.argb = None
+        self.count = 0
+        self.capacity = 0
+        self.views = []
+        self.colors = []
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.xOld = numpy.zeros(0)
+        self.yOld = numpy.zeros(0)
+        # Heading as a unit vector; angles are only worked out for drawing
+        self.xDirection = numpy.zeros(0)
+        self.yDirection = numpy.zeros(0)
+        self.movement = numpy.zeros(0)
+        self.state = numpy.zeros(0, dtype=numpy.int8)
+        self.xBuffer = numpy.zeros(0)
+        self.yBuffer = numpy.zeros(0)
+        self.updates = numpy.zeros(0, dtype=numpy.int32)
+        # Turn state towards each attractor, for the (agent, attractor) pairs
+        # that are turning: keys agent*KEY_SHIFT + attractor row, sorted
+        self.turnKeys = numpy.zeros(0, dtype=numpy.int64)
+        self.turnStates = numpy.zeros(0, dtype=numpy.int8)
+        self.reserve(capacity)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name in ('x', 'y', 'xOld', 'yOld', 'xDirection', 'yDirection', 'movement',
+                     'state', 'xBuffer', 'yBuffer', 'updates'):
+            old = getattr(self, name)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def spawn(self, x=0, y=0, heading=0.0, color=None):
+        if self.count == self.capacity:
+            self.reserve(max(16, self.capacity*2))
+        i = self.count
+        self.count += 1
+        self.x[i] = self.xOld[i] = x
+        self.y[i] = self.yOld[i] = y
+        self.xSum += x
+        self.ySum += y
+        self.xDirection[i] = math.cos(heading)
+        self.yDirection[i] = math.sin(heading)
+        self.movement[i] = self.movementFactor
+        self.state[i] = STATE_NORMAL
+        self.xBuffer[i] = self.yBuffer[i] = 0
+        self.updates[i] = 0
+        if color is None:
+            color = QtGui.QColor(random.choice(colorTable))
+        self.colors.append(color)
+        self.argb = None
+        view = Follower(self, i)
+        self.views.append(view)
+        return view
+
+    # Drops every agent from row count on
+    def truncate(self, count):
+        if count >= self.count:
+            return
+        self.xSum -= self.x[count:self.count].sum()
+        self.ySum -= self.y[count:self.count].sum()
+        self.count = count
+        kept = self.turnKeys < count*KEY_SHIFT
+        self.turnKeys = self.turnKeys[kept]
+        self.turnStates = self.turnStates[kept]
+        self.argb = None
+        del self.colors[count:]
+        del self.views[count:]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def centroid(self):
+        return self.xSum/self.count, self.ySum/self.count
+
+    def resum(self):
+        n = self.count
+        self.xSum = self.x[:n].sum()
+        self.ySum = self.y[:n].sum()
+
+    # Centroid of every agent's neighbours within radius, found through the
+    # grid; alone marks the agents with no neighbours at all
+    def localCentroids(self, radius):
+        n = self.count
+        pairsI, pairsJ = self.grid.pairsWithin(radius)[:2]
+        neighbours = numpy.bincount(pairsI, minlength=n)
+        alone = neighbours == 0
+        neighbours[alone] = 1
+        xAvg = numpy.bincount(pairsI, self.x[pairsJ], n)/neighbours
+        yAvg = numpy.bincount(pairsI, self.y[pairsJ], n)/neighbours
+        return xAvg, yAvg, alone
+
+    def updateHeading(self, xn, yn, weight, mask=None):
+        n = self.count
+        if mask is None:
+            self.xBuffer[:n] += xn*weight
+            self.yBuffer[:n] += yn*weight
+            self.updates[:n] += 1
+        else:
+            self.xBuffer[:n][mask] += xn[mask]*weight
+            self.yBuffer[:n][mask] += yn[mask]*weight
+            self.updates[:n][mask] += 1
+
+    # xAvg and yAvg are either one centroid for everyone or one per agent
+    def navigateTowardsOthers(self, xAvg, yAvg, mask=None):
+        n = self.count
+        vectorX, vectorY, _ = unitVectors(xAvg - self.x[:n], yAvg - self.y[:n])
+        self.updateHeading(vectorX, vectorY, self.focusOnCohesion, mask)
+
+    def navigateToTarget(self, target):
+        n = self.count
+        state = self.state[:n]
+        movement = self.movement[:n]
+        if self.compiled:
+            x, y = self.x[:n], self.y[:n]
+            self.pickTurns(state, kernels.enteringTarget(x, y, target.x(), target.y(), self.distanceRoot, state))
+            kernels.steerToTarget(x, y, target.x(), target.y(), self.distanceRoot, self.movementFactor,
+                                  self.focusOnGoal, state, movement,
+                                  self.xBuffer[:n], self.yBuffer[:n], self.updates[:n])
+            return
+        vectorX, vectorY, divisorUnit = unitVectors(target.x() - self.x[:n],
+                                                    target.y() - self.y[:n])
+
+        # when you get too close, pick a direction to start turning away.
+        # Keep turning that direction until you get far enough away again
+        close = divisorUnit <= self.distanceRoot
+        self.pickTurns(state, numpy.flatnonzero((state == STATE_NORMAL) & close))
+
+        # Left turns map (x, y) to (-y, x), right turns to (y, -x)
+        turning = state != STATE_NORMAL
+        vectorX, vectorY = (numpy.where(turning, state*vectorY, vectorX),
+                            numpy.where(turning, -state*vectorX, vectorY))
+
+        numpy.minimum(movement + 0.1, self.movementFactor*2, out=movement, where=~turning)
+        movement[turning & (movement > self.movementFactor)] -= 0.2
+
+        self.updateHeading(vectorX, vectorY, self.focusOnGoal)
+
+        state[turning & ~close] = STATE_NORMAL
+
+    # navigateToTarget for an attractor.AttractorSet.  Each agent runs the
+    # turn state machine against every one of its nearest attractors, then
+    # steers along their vectors blended by pull.  It counts as turning, for
+    # its speed, while it turns around any of them, and its state column shows
+    # the turn around the nearest.  With one attractor of weight 1 on the
+    # target this is navigateToTarget.
+    def navigateToAttractors(self, attractors):
+        n = self.count
+        movement = self.movement[:n]
+        rows, distance = attractors.nearestTo(self.x[:n], self.y[:n])
+        k = rows.shape[1]
+        agents = numpy.repeat(numpy.arange(n), k)
+        rows = rows.ravel()
+        vectorX, vectorY, divisorUnit = unitVectors(attractors.x[rows] - self.x[agents],
+                                                    attractors.y[rows] - self.y[agents])
+
+        # Pick up the turns still going from the last tick
+        keys = agents*KEY_SHIFT + rows
+        state = numpy.zeros(len(keys), dtype=numpy.int8)
+        if len(self.turnKeys):
+            slots = numpy.minimum(numpy.searchsorted(self.turnKeys, keys), len(self.turnKeys) - 1)
+            known = self.turnKeys[slots] == keys
+            state[known] = self.turnStates[slots[known]]
+
+        close = divisorUnit <= self.distanceRoot
+        self.pickTurns(state, numpy.flatnonzero((state == STATE_NORMAL) & close))
+        turning = state != STATE_NORMAL
+        vectorX, vectorY = (numpy.where(turning, state*vectorY, vectorX),
+                            numpy.where(turning, -state*vectorX, vectorY))
+
+        pull = attractors.strength(rows, divisorUnit)
+        total = numpy.bincount(agents, pull, n)
+        total[total == 0] = 1
+        vectorX = numpy.bincount(agents, pull*vectorX, n)/total
+        vectorY = numpy.bincount(agents, pull*vectorY, n)/total
+
+        agentTurning = numpy.bincount(agents, turning, n) > 0
+        numpy.minimum(movement + 0.1, self.movementFactor*2, out=movement, where=~agentTurning)
+        movement[agentTurning & (movement > self.movementFactor)] -= 0.2
+
+        self.updateHeading(vectorX, vectorY, self.focusOnGoal)
+
+        state[turning & ~close] = STATE_NORMAL
+        self.state[:n] = state[::k] if k else STATE_NORMAL
+        turning = numpy.flatnonzero(state != STATE_NORMAL)
+        order = numpy.argsort(keys[turning])
+        self.turnKeys = keys[turning][order]
+        self.turnStates = state[turning][order]
+
+    # Each of the entering rows starts turning a random way
+    def pickTurns(self, state, entering):
+        for i in entering:
+            state[i] = random.choice((STATE_TURN_RIGHT, STATE_TURN_LEFT))
+
+    # Offset from the nearest other agent within distanceRoot; clearing marks
+    # the agents that have anything close enough to avoid.  Only the rows in
+    # agents, if given, are looked at.
+    # Expects the grid to hold this tick's positions, see navigate()
+    def nearestNeighbours(self, agents=None):
+        closestX, closestY, clearing = self.grid.nearest(self.distanceRoot, agents)
+        if self.checkGrid:
+            self.checkNeighbours(closestX, closestY, clearing, agents)
+        return closestX, closestY, clearing
+
+    # Ties may resolve to different agents, so compare distances, not offsets
+    def checkNeighbours(self, closestX, closestY, clearing, agents=None):
+        bruteX, bruteY, bruteClearing = self.nearestNeighboursBrute()
+        if agents is not None:
+            looked = numpy.zeros(self.count, dtype=bool)
+            looked[agents] = True
+            bruteClearing &= looked
+        if not numpy.array_equal(clearing, bruteClearing):
+            raise AssertionError('grid missed agents %s' % numpy.flatnonzero(clearing != bruteClearing))
+        if not numpy.allclose(numpy.hypot(closestX, closestY)[clearing],
+                              numpy.hypot(bruteX, bruteY)[clearing]):
+            raise AssertionError('grid picked a farther neighbour')
+
+    def nearestNeighboursBrute(self):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        closestX = numpy.zeros(n)
+        closestY = numpy.zeros(n)
+        clearing = numpy.zeros(n, dtype=bool)
+        for start in range(0, n, CLEAR_BLOCK):
+            stop = min(start + CLEAR_BLOCK, n)
+            vectorRawX = x[start:stop, None] - x[None, :]
+            vectorRawY = y[start:stop, None] - y[None, :]
+            distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+            rows = numpy.arange(stop - start)
+            distance[rows, rows + start] = numpy.inf
+            distance[distance > self.distanceRoot**2] = numpy.inf
+            nearest = distance.argmin(axis=1)
+            found = numpy.isfinite(distance[rows, nearest])
+            clearing[start:stop] = found
+            closestX[start:stop] = numpy.where(found, vectorRawX[rows, nearest], 0)
+            closestY[start:stop] = numpy.where(found, vectorRawY[rows, nearest], 0)
+        return closestX, closestY, clearing
+
+    # Rows that look for neighbours this tick, or None for all of them.  At
+    # DETAIL_SPARSE those far from the target take turns, staggered by row so
+    # each tick does about the same work.
+    def avoiding(self, target):
+        if self.detail < DETAIL_SPARSE:
+            return None
+        n = self.count
+        near = (self.x[:n] - target.x())**2 + (self.y[:n] - target.y())**2 <= SPARSE_RADIUS**2
+        turn = (numpy.arange(n) + self.ticks) % SPARSE_STRIDE == 0
+        return numpy.flatnonzero(near | turn)
+
+    def navigateClear(self, agents=None):
+        if self.compiled and not self.checkGrid:
+            n = self.count
+            grid = self.grid
+            checks = kernels.steerClear(grid.x, grid.y, grid.keys, grid.x, grid.y, grid.sortedKeys, grid.order,
+                                        grid.reach(self.distanceRoot), self.distanceRoot,
+                                        numpy.arange(n) if agents is None else agents, True,
+                                        self.focusOnAvoidance, self.xBuffer[:n], self.yBuffer[:n], self.updates[:n])
+            self.metrics.count('neighbourChecks', checks)
+            return
+        closestX, closestY, clearing = self.nearestNeighbours(agents)
+        self.metrics.count('neighbourChecks', self.grid.checks)
+        vectorX, vectorY, _ = unitVectors(closestX, closestY)
+        self.updateHeading(vectorX, vectorY, self.focusOnAvoidance, clearing)
+
+    # Steers clear of the nearest of the points x, y within distanceRoot, as
+    # navigateClear does for other followers
+    def navigateAround(self, x, y):
+        if not len(x):
+            return
+        n = self.count
+        self.obstacles.rebuild(x, y)
+        if self.compiled:
+            grid = self.obstacles
+            kernels.steerClear(self.x[:n], self.y[:n], grid.cellKeys(self.x[:n], self.y[:n]),
+                               grid.x, grid.y, grid.sortedKeys, grid.order,
+                               grid.reach(self.distanceRoot), self.distanceRoot,
+                               numpy.arange(n), False, self.focusOnAvoidance,
+                               self.xBuffer[:n], self.yBuffer[:n], self.updates[:n])
+            return
+        closestX, closestY, clearing = self.obstacles.nearestTo(self.x[:n], self.y[:n], self.distanceRoot)
+        vectorX, vectorY, _ = unitVectors(closestX, closestY)
+        self.updateHeading(vectorX, vectorY, self.focusOnAvoidance, clearing)
+
+    # Steers the agents within MAP_REACH of a wall of the obstaclemap.ObstacleMap
+    # away from it, harder the closer they are and harder still once past it
+    def navigateMap(self, obstacleMap):
+        n = self.count
+        distance, xAway, yAway = obstacleMap.lookup(self.x[:n], self.y[:n])
+        near = distance < MAP_REACH
+        push = numpy.minimum(MAP_PUSH, 1 - distance/MAP_REACH)*self.focusOnAvoidance
+        self.updateHeading(xAway*push, yAway*push, 1, near)
+
+    # Angles in (-pi, pi], as Follower.heading and the sprites use them
+    def headings(self):
+        n = self.count
+        return numpy.arctan2(self.yDirection[:n], self.xDirection[:n])
+
+    # Blends the steering vectors into the direction without leaving vector
+    # form.  The speed damping of Follower.finalizeHeading depends on the
+    # plain difference of the two atan2 angles, so a turn across the -x axis
+    # counts as nearly a full circle there; that is kept, and any turn of a
+    # quarter circle or more damps by the 0.5 floor either way, leaving one
+    # arctan2 for small turns as the only transcendental call.
+    def finalizeHeading(self):
+        n = self.count
+        if self.compiled:
+            kernels.finalizeHeading(self.xDirection[:n], self.yDirection[:n], self.movement[:n],
+                                    self.xBuffer[:n], self.yBuffer[:n], self.updates[:n])
+            return
+        xDirection = self.xDirection[:n]
+        yDirection = self.yDirection[:n]
+        movement = self.movement[:n]
+        xBuffer = (self.xBuffer[:n]/self.updates[:n] + xDirection)/2
+        yBuffer = (self.yBuffer[:n]/self.updates[:n] + yDirection)/2
+
+        # atan2(0, 0) is 0, so a zero blend faces along +x
+        xNew, yNew, length = unitVectors(xBuffer, yBuffer)
+        xNew[length == 0] = 1
+
+        dot = xDirection*xNew + yDirection*yNew
+        cross = xDirection*yNew - yDirection*xNew
+        acrossAxis = (yDirection*yNew < 0) & (cross*yDirection > 0)
+        headingdelta = numpy.arctan2(numpy.abs(cross), dot)
+        damping = numpy.where(acrossAxis | (dot <= 0), 0.5, numpy.maximum(0.5, (math.pi - headingdelta)/math.pi))
+        movement[:] = numpy.maximum(0.5, movement*damping)
+        xDirection[:] = xNew
+        yDirection[:] = yNew
+
+        self.updates[:n] = 0
+        self.xBuffer[:n] = 0
+        self.yBuffer[:n] = 0
+
+    # obstacles, if given, is an (x, y) pair of arrays of other agents to avoid
+    # attractors, if given, is an attractor.AttractorSet steered towards
+    # instead of the target, and obstacleMap an obstaclemap.ObstacleMap whose
+    # walls are steered clear of
+    def navigate(self, target, obstacles=None, attractors=None, obstacleMap=None):
+        if not self.count:
+            return
+        n = self.count
+        metrics = self.metrics
+        metrics.start()
+        self.grid.rebuild(self.x[:n], self.y[:n])
+        metrics.lap('grid')
+
+        # Towards other boids
+        if self.cohesionRadius is None:
+            xAvg, yAvg = self.centroid()
+            self.navigateTowardsOthers(xAvg, yAvg)
+        else:
+            xAvg, yAvg, alone = self.localCentroids(self.cohesionRadius)
+            self.navigateTowardsOthers(xAvg, yAvg, ~alone)
+        metrics.lap('centroid')
+
+        # Towards target, but don't ram it
+        if attractors is None or not len(attractors):
+            self.navigateToTarget(target)
+        else:
+            self.navigateToAttractors(attractors)
+        metrics.lap('steering')
+
+        # Aversion
+        self.navigateClear(self.avoiding(target))
+        if obstacles is not None:
+            self.navigateAround(*obstacles)
+        if obstacleMap is not None:
+            self.navigateMap(obstacleMap)
+        metrics.lap('avoidance')
+
+        # Gather and go
+        self.finalizeHeading()
+
+        self.xOld[:n] = self.x[:n]
+        self.yOld[:n] = self.y[:n]
+        xMove = self.xDirection[:n]*self.movement[:n]
+        yMove = self.yDirection[:n]*self.movement[:n]
+        self.x[:n] += xMove
+        self.y[:n] += yMove
+
+        self.ticks += 1
+        if self.ticks % RESUM_EVERY:
+            self.xSum += xMove.sum()
+            self.ySum += yMove.sum()
+        else:
+            self.resum()
+        metrics.lap('finalize')
+
+    def positions(self):
+        n = self.count
+        return self.x[:n], self.y[:n]
+
+    # (n, 4) array of left, top, right, bottom around every agent as drawn
+    # Covers both the last two positions, since draw() may land anywhere between
+    def bounds(self):
+        n = self.count
+        left = numpy.minimum(self.x[:n], self.xOld[:n])
+        top = numpy.minimum(self.y[:n], self.yOld[:n])
+        right = numpy.maximum(self.x[:n], self.xOld[:n])
+        bottom = numpy.maximum(self.y[:n], self.yOld[:n])
+        return numpy.column_stack((left - SQUARE_SIZE, top - SQUARE_SIZE, right + SQUARE_SIZE, bottom + SQUARE_SIZE))
+
+    def colorPixels(self):
+        if self.argb is None:
+            self.argb = numpy.array([color.rgb() for color in self.colors[:self.count]], dtype=numpy.uint32)
+        return self.argb
+
+    # Every agent becomes a SQUARE_SIZE square written straight into an image
+    # around the flock, which is then drawn with one call.  Only agents on the
+    # painter's device count, so one far off does not stretch the image over
+    # the whole way to it.
+    def drawPoints(self, painter, x, y, argb):
+        half = SQUARE_SIZE//2
+        device = painter.device()
+        area = painter.transform().inverted()[0].mapRect(QtCore.QRectF(0, 0, device.width(), device.height()))
+        shown = ((x >= area.left() - SQUARE_SIZE) & (x <= area.right() + SQUARE_SIZE) &
+                 (y >= area.top() - SQUARE_SIZE) & (y <= area.bottom() + SQUARE_SIZE))
+        if not shown.any():
+            return
+        columns = x[shown].astype(int)
+        rows = y[shown].astype(int)
+        argb = argb[shown]
+        left = columns.min() - half
+        top = rows.min() - half
+        width = columns.max() - left + half + 1
+        height = rows.max() - top + half + 1
+        pixels = numpy.zeros((height, width), dtype=numpy.uint32)
+        columns -= left
+        rows -= top
+        for dy in range(-half, SQUARE_SIZE - half):
+            for dx in range(-half, SQUARE_SIZE - half):
+                pixels[rows + dy, columns + dx] = argb
+        image = QtGui.QImage(pixels.data, width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+        painter.drawImage(int(left), int(top), image)
+
+    # Positions alpha of the way from the previous (0) to the current (1) ones
+    def interpolated(self, alpha):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        if alpha != 1.0:
+            x = self.xOld[:n] + (x - self.xOld[:n])*alpha
+            y = self.yOld[:n] + (y - self.yOld[:n])*alpha
+        return x, y
+
+    # alpha interpolates between the previous (0) and current (1) positions.
+    # rows, if given, picks the agents to draw.
+    def draw(self, painter, target, alpha=1.0, rows=None):
+        x, y = self.interpolated(alpha)
+        heading = self.headings()
+        if self.detail >= DETAIL_POINTS:
+            argb = self.colorPixels()
+            if rows is not None:
+                x, y, argb = x[rows], y[rows], argb[rows]
+            self.drawPoints(painter, x, y, argb)
+            return
+        colors = self.colors
+        if rows is not None:
+            x, y, heading = x[rows], y[rows], heading[rows]
+            colors = [colors[i] for i in rows.tolist()]
+        if self.detail == DETAIL_FLAT:
+            flatFollowerAtlas().drawMany(painter, x, y, heading, colors)
+        else:
+            followerAtlas().drawMany(painter, x, y, heading, colors)
@@ -6,12 +6,11 @@ from __future__ import division
 import math
 import sys, random
 
-from ctypes import windll, Structure, c_long, byref
-
 from PySide import QtCore, QtGui
 
-class POINT(Structure):
-    _fields_ = [("x", c_long), ("y", c_long)]
+from cursor import defaultCursor
+from dirty import DirtyRegion
+from sprites import SpriteAtlas
 
 SQUARE_SIZE = 3
 
@@ -28,11 +27,8 @@ STATE_NORMAL = 0
 STATE_TURN_LEFT = -1
 STATE_TURN_RIGHT = 1
 
-def queryMousePosition():
-    pt = POINT()
-    windll.user32.GetCursorPos(byref(pt))
-    return { "x": pt.x, "y": pt.y}
-
+colorTable = [0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
+              0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]
 
 class Communicate(QtCore.QObject):
     
@@ -79,6 +75,7 @@ class Board(QtGui.QFrame):
         super(Board, self).__init__()
 
         self.timer = QtCore.QBasicTimer()
+        self.dirty = DirtyRegion()
         self.pieces = []
         
         for i in range(NUM_BIOTS):
@@ -86,6 +83,10 @@ class Board(QtGui.QFrame):
             self.curPiece.x = random.randint(0, self.frameRect().width())
             self.curPiece.y = random.randint(0, self.frameRect().height())
             self.pieces.append(self.curPiece)
+
+        # Running sums for the centroid, moved along with every piece
+        self.xSum = sum(piece.x for piece in self.pieces)
+        self.ySum = sum(piece.y for piece in self.pieces)
             
         self.curX = 0
         self.curY = 0
@@ -93,8 +94,10 @@ class Board(QtGui.QFrame):
         self.board = []
 
         self.isStarted = False
+        self.sprites = None
 
         self.target = QtCore.QPointF(5, 10)
+        self.cursor = defaultCursor()
         
     def start(self):
         self.isStarted = True
@@ -104,13 +107,13 @@ class Board(QtGui.QFrame):
     def timerEvent(self, event):
         #print ".",
 
-        pos = queryMousePosition()
+        x, y = self.cursor.position()
         try:
-            self.target.setX(pos["x"])
+            self.target.setX(x)
         except OverflowError as e:
             self.target.setX(0)
         try:
-            self.target.setY(pos["y"])
+            self.target.setY(y)
         except OverflowError as e:
             self.target.setY(0)
 
@@ -123,13 +126,20 @@ class Board(QtGui.QFrame):
 
     def moveTowardsTarget(self):
         #headings = [piece.heading for piece in self.pieces]
-        xAvg = sum([piece.x for piece in self.pieces])/len(self.pieces)
-        yAvg = sum([piece.y for piece in self.pieces])/len(self.pieces)
+        xAvg = self.xSum/len(self.pieces)
+        yAvg = self.ySum/len(self.pieces)
 
         for piece in self.pieces:
             piece.navigate(xAvg, yAvg, self.target, self.pieces)
+            self.xSum += piece.x - piece.xOld
+            self.ySum += piece.y - piece.yOld
 
-        self.update()
+        rect = self.contentsRect()
+        left = rect.left()
+        top = rect.top() - 1
+        self.dirty.repaint(self, [(left + piece.x - SQUARE_SIZE, top + piece.y - SQUARE_SIZE,
+                                   left + piece.x + SQUARE_SIZE, top + piece.y + SQUARE_SIZE)
+                                  for piece in self.pieces])
 
     def paintEvent(self, event):
         painter = QtGui.QPainter(self)
@@ -144,26 +154,26 @@ class Board(QtGui.QFrame):
                             i%7+1, piece.heading*180/math.pi)
 
     def drawSquare(self, painter, x, y, shape, angle):
-        
-        colorTable = [0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
-                      0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]
-
-        color = QtGui.QColor(colorTable[shape])
-
-        painter.setPen(color)
-
-        # Circle with line pointing in the direction of travel and 2 shading arcs
-        painter.drawEllipse(QtCore.QPoint(x, y), SQUARE_SIZE, SQUARE_SIZE)
-        painter.drawLine(x, y,
-                         x+math.cos(angle*math.pi/180)*SQUARE_SIZE, y+math.sin(angle*math.pi/180)*SQUARE_SIZE)
-        painter.setPen(color.darker())
-        painter.drawArc(x-SQUARE_SIZE+1, y-SQUARE_SIZE+1,
-                        SQUARE_SIZE*2-2, SQUARE_SIZE*2-2,
-                        (-angle+270)*16, (-180)*16)
-        painter.setPen(color.lighter())
-        painter.drawArc(x-SQUARE_SIZE+1, y-SQUARE_SIZE+1,
-                        SQUARE_SIZE*2-2, SQUARE_SIZE*2-2,
-                        (-angle+90)*16, (-180)*16)
+        if self.sprites is None:
+            self.sprites = SpriteAtlas(renderShape, SQUARE_SIZE, colorTable)
+        self.sprites.drawCell(painter, x, y, angle*math.pi/180, shape)
+
+def renderShape(painter, color, angle, center):
+    painter.setPen(color)
+
+    # Circle with line pointing in the direction of travel and 2 shading arcs
+    painter.drawEllipse(QtCore.QPoint(center, center), SQUARE_SIZE, SQUARE_SIZE)
+    painter.drawLine(center, center,
+                     center+math.cos(angle*math.pi/180)*SQUARE_SIZE, center+math.sin(angle*math.pi/180)*SQUARE_SIZE)
+    painter.setPen(color.darker())
+    painter.drawArc(center-SQUARE_SIZE+1, center-SQUARE_SIZE+1,
+                    SQUARE_SIZE*2-2, SQUARE_SIZE*2-2,
+                    (-angle+270)*16, (-180)*16)
+    painter.setPen(color.lighter())
+    painter.drawArc(center-SQUARE_SIZE+1, center-SQUARE_SIZE+1,
+                    SQUARE_SIZE*2-2, SQUARE_SIZE*2-2,
+                    (-angle+90)*16, (-180)*16)
+
 class Shape(object):
     
     def __init__(self):
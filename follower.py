@@ -1,4 +1,4 @@
-from PySide import QtCore, QtGui
+from PySide import QtCore
 
 import math, random
 
@@ -30,21 +30,62 @@ colorTable = [0x16161D, 0xD9D9D1,
               0xCCCC66, 0xCC66CC, 0x66CCCC,
               0xDAAA00, 0xDA00AA, 0xAADA00, 0xAA00DA, 0x00DAAA, 0x00AADA]
 
+# Property reading and writing one row of the column name in the batch held in
+# the view's owner attribute.  total names the batch attribute holding the
+# running sum of the column, if any.
+def rowAttribute(name, cast=float, total=None, owner='flock'):
+    def fget(self):
+        return cast(getattr(getattr(self, owner), name)[self.index])
+    def fset(self, value):
+        batch = getattr(self, owner)
+        column = getattr(batch, name)
+        if total is not None:
+            setattr(batch, total, getattr(batch, total) + value - column[self.index])
+        column[self.index] = value
+    return property(fget, fset)
+
+# A Follower is a view over one row of a flock.Flock.  Constructed on its own
+# it gets a private single-agent flock; Flock.spawn() hands out views that
+# share the arrays of the whole flock.
 class Follower(object):
     
-    def __init__(self):
-        self.state = STATE_NORMAL
+    def __init__(self, flock=None, index=None):
+        if flock is None:
+            from flock import Flock
+            flock = Flock(1)
+            flock.spawn()
+            index = 0
+        self.flock = flock
+        self.index = index
         self.target = QtCore.QPointF(0, 0)
-        self.x = 0
-        self.y = 0
-        self.xBuffer = 0
-        self.yBuffer = 0
-        self.heading = 0.0
 
-        self.color = QtGui.QColor(random.choice(colorTable))
-
-        self.countOfUpdateVectorsSinceFinalizing = 0
-        self.movement = MOVEMENT_FACTOR
+    x = rowAttribute('x', total='xSum')
+    y = rowAttribute('y', total='ySum')
+    xOld = rowAttribute('xOld')
+    yOld = rowAttribute('yOld')
+    movement = rowAttribute('movement')
+    state = rowAttribute('state', int)
+    xBuffer = rowAttribute('xBuffer')
+    yBuffer = rowAttribute('yBuffer')
+    countOfUpdateVectorsSinceFinalizing = rowAttribute('updates', int)
+
+    @property
+    def heading(self):
+        return math.atan2(self.flock.yDirection[self.index], self.flock.xDirection[self.index])
+
+    @heading.setter
+    def heading(self, value):
+        self.flock.xDirection[self.index] = math.cos(value)
+        self.flock.yDirection[self.index] = math.sin(value)
+
+    @property
+    def color(self):
+        return self.flock.colors[self.index]
+
+    @color.setter
+    def color(self, value):
+        self.flock.colors[self.index] = value
+        self.flock.argb = None
         
     def distanceToSquare(self, other):
         return (other.x-self.x)*(other.x-self.x) + (other.y-self.y)*(other.y-self.y)
@@ -123,7 +164,7 @@ class Follower(object):
                 continue
             vectorRawX = (self.x - pieceOther.x)
             vectorRawY = (self.y - pieceOther.y)
-            if abs(vectorRawX) > DISTANCE_AVERSION or abs(vectorRawY) > DISTANCE_AVERSION:
+            if abs(vectorRawX) > DISTANCE_ROOT or abs(vectorRawY) > DISTANCE_ROOT:
                 continue
             if self.distanceToSquare(pieceOther) > DISTANCE_AVERSION:
                 continue
@@ -153,7 +194,7 @@ class Follower(object):
                 continue
             vectorRawX = (self.x - pieceOther.x)
             vectorRawY = (self.y - pieceOther.y)
-            if abs(vectorRawX) > DISTANCE_AVERSION or abs(vectorRawY) > DISTANCE_AVERSION:
+            if abs(vectorRawX) > DISTANCE_ROOT or abs(vectorRawY) > DISTANCE_ROOT:
                 continue
             if self.distanceToSquare(pieceOther) > DISTANCE_AVERSION:
                 continue
@@ -0,0 +1,274 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import ctypes, sys, time
+
+import numpy
+
+from PySide import QtCore, QtGui, QtOpenGL
+
+from OpenGL import GL
+
+from cursor import ScriptedCursor, circlePath
+from decorator import Board, screenOverlays, metricsOption
+from follower import SQUARE_SIZE
+from scene import Scene, loadScene
+from stepper import Stepper
+
+# GLSL 1.30 with instanced arrays (GL 3.3, or 3.0 plus ARB_instanced_arrays)
+# is all this needs, which Mesa's llvmpipe provides without a GPU.  A
+# compatibility context is kept so QPainter can still draw on the same widget.
+
+# Each follower is one instance of a quad around it.  The quad's corners
+# come from a static buffer; the follower's position, direction and color
+# come from one row of the instance buffer.
+VERTEX_SHADER = """
+#version 130
+uniform vec2 origin;
+uniform vec2 size;
+uniform float radius;
+in vec2 corner;
+in vec2 position;
+in vec2 heading;
+in vec4 color;
+out vec2 local;
+out vec2 direction;
+out vec4 tint;
+void main() {
+    local = corner*radius;
+    direction = heading;
+    // Colors are uploaded as the bytes of QColor.rgb(), which are BGRA
+    tint = color.zyxw;
+    vec2 pixel = floor(position) + 0.5 + local;
+    vec2 ndc = (pixel - origin)/size*2.0 - 1.0;
+    gl_Position = vec4(ndc.x, -ndc.y, 0.0, 1.0);
+}
+"""
+
+# The ring of renderFollower, and the darker arc over the half facing away
+# from the heading
+FRAGMENT_SHADER = """
+#version 130
+uniform float ring;
+in vec2 local;
+in vec2 direction;
+in vec4 tint;
+out vec4 fragColor;
+void main() {
+    float d = length(local);
+    if (abs(d - ring) <= 0.5) {
+        fragColor = tint;
+    } else if (abs(d - (ring - 1.0)) <= 0.5 && dot(local, direction) <= 0.0) {
+        fragColor = vec4(tint.rgb*0.5, tint.a);
+    } else {
+        discard;
+    }
+}
+"""
+
+# Attribute locations, bound before linking
+CORNER = 0
+POSITION = 1
+HEADING = 2
+COLOR = 3
+
+# One row of the instance buffer
+INSTANCE_DTYPE = numpy.dtype([('x', numpy.float32), ('y', numpy.float32),
+                              ('xDirection', numpy.float32), ('yDirection', numpy.float32),
+                              ('color', numpy.uint8, 4)])
+
+QUAD = numpy.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype=numpy.float32)
+
+def compileProgram():
+    program = GL.glCreateProgram()
+    for kind, source in ((GL.GL_VERTEX_SHADER, VERTEX_SHADER), (GL.GL_FRAGMENT_SHADER, FRAGMENT_SHADER)):
+        shader = GL.glCreateShader(kind)
+        GL.glShaderSource(shader, source)
+        GL.glCompileShader(shader)
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            raise RuntimeError(GL.glGetShaderInfoLog(shader))
+        GL.glAttachShader(program, shader)
+    for location, name in ((CORNER, 'corner'), (POSITION, 'position'), (HEADING, 'heading'), (COLOR, 'color')):
+        GL.glBindAttribLocation(program, location, name)
+    GL.glLinkProgram(program)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        raise RuntimeError(GL.glGetProgramInfoLog(program))
+    return program
+
+# GL state for drawing a Flock with one instanced call.  Needs a current
+# context when built and whenever it draws.
+class FlockRenderer(object):
+
+    def __init__(self):
+        self.program = compileProgram()
+        self.uniforms = dict((name, GL.glGetUniformLocation(self.program, name))
+                             for name in ('origin', 'size', 'radius', 'ring'))
+        self.quad, self.buffer = GL.glGenBuffers(2)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.quad)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, QUAD.nbytes, QUAD, GL.GL_STATIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self.instances = numpy.zeros(0, dtype=INSTANCE_DTYPE)
+
+    # Fills the instance rows for the followers in rows, or all of them
+    def pack(self, flock, alpha, rows):
+        x, y = flock.interpolated(alpha)
+        xDirection = flock.xDirection[:flock.count]
+        yDirection = flock.yDirection[:flock.count]
+        argb = flock.colorPixels()
+        if rows is not None:
+            x, y, argb = x[rows], y[rows], argb[rows]
+            xDirection, yDirection = xDirection[rows], yDirection[rows]
+        n = len(x)
+        if len(self.instances) < n:
+            self.instances = numpy.zeros(max(n, 2*len(self.instances)), dtype=INSTANCE_DTYPE)
+        instances = self.instances[:n]
+        instances['x'] = x
+        instances['y'] = y
+        instances['xDirection'] = xDirection
+        instances['yDirection'] = yDirection
+        instances['color'] = argb.view(numpy.uint8).reshape(-1, 4)
+        return instances
+
+    # screen is the QRect, in desktop coordinates, the viewport shows
+    def draw(self, flock, alpha, rows, screen):
+        instances = self.pack(flock, alpha, rows)
+        if not len(instances):
+            return
+        GL.glUseProgram(self.program)
+        GL.glUniform2f(self.uniforms['origin'], screen.left(), screen.top())
+        GL.glUniform2f(self.uniforms['size'], screen.width(), screen.height())
+        GL.glUniform1f(self.uniforms['radius'], SQUARE_SIZE + 1)
+        GL.glUniform1f(self.uniforms['ring'], SQUARE_SIZE)
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.quad)
+        GL.glEnableVertexAttribArray(CORNER)
+        GL.glVertexAttribPointer(CORNER, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+
+        # Orphan last frame's storage rather than wait for the GPU to finish with it
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.buffer)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, instances.nbytes, None, GL.GL_STREAM_DRAW)
+        GL.glBufferSubData(GL.GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+        stride = INSTANCE_DTYPE.itemsize
+        for location, size, kind, normalized, offset in (
+                (POSITION, 2, GL.GL_FLOAT, GL.GL_FALSE, 'x'),
+                (HEADING, 2, GL.GL_FLOAT, GL.GL_FALSE, 'xDirection'),
+                (COLOR, 4, GL.GL_UNSIGNED_BYTE, GL.GL_TRUE, 'color')):
+            GL.glEnableVertexAttribArray(location)
+            GL.glVertexAttribPointer(location, size, kind, normalized, stride,
+                                     ctypes.c_void_p(INSTANCE_DTYPE.fields[offset][1]))
+            GL.glVertexAttribDivisor(location, 1)
+
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_ONE, GL.GL_ONE_MINUS_SRC_ALPHA)
+        GL.glDrawArraysInstanced(GL.GL_TRIANGLE_STRIP, 0, 4, len(instances))
+
+        # Leave the state as QPainter expects to find it
+        for location in (CORNER, POSITION, HEADING, COLOR):
+            GL.glVertexAttribDivisor(location, 0)
+            GL.glDisableVertexAttribArray(location)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        GL.glUseProgram(0)
+
+def glFormat():
+    format = QtOpenGL.QGLFormat()
+    format.setAlpha(True)
+    format.setDoubleBuffer(True)
+    return format
+
+# Draws every frame of a GLBoard: the flock through a FlockRenderer, then the
+# other species, which are few, through QPainter on the same context
+class AgentCanvas(QtOpenGL.QGLWidget):
+
+    def __init__(self, board):
+        super(AgentCanvas, self).__init__(glFormat(), board)
+        self.board = board
+        self.renderer = None
+        self.setAttribute(QtCore.Qt.WA_TranslucentBackground)
+        self.setAutoFillBackground(False)
+
+    def initializeGL(self):
+        self.renderer = FlockRenderer()
+
+    def resizeGL(self, width, height):
+        GL.glViewport(0, 0, width, height)
+
+    def paintEvent(self, event):
+        board = self.board
+        stepper = board.stepper
+        start = time.time()
+        board.metrics.start()
+        alpha = board.clock.alpha()
+        painter = QtGui.QPainter(self)
+        painter.beginNativePainting()
+        GL.glClearColor(0, 0, 0, 0)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        self.renderer.draw(stepper.flock, alpha, stepper.visible(stepper.flock, board.screen), board.screen)
+        painter.endNativePainting()
+        painter.translate(-board.screen.left(), -board.screen.top())
+        stepper.draw(painter, alpha, board.screen, [batch for batch in stepper.batches() if batch is not stepper.flock])
+        painter.resetTransform()
+        board.hud.draw(painter)
+        painter.end()
+        board.metrics.lap('paint')
+        board.lead.frameCost += time.time() - start
+
+# Board that paints through an AgentCanvas filling it.  The canvas redraws
+# the whole screen every frame, so there are no dirty tiles to track.
+class GLBoard(Board):
+
+    def __init__(self, parent, lead=None):
+        super(GLBoard, self).__init__(parent, lead)
+        self.canvas = AgentCanvas(self)
+        layout = QtGui.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def repaintAgents(self, boxes):
+        self.canvas.update()
+
+    def refreshHud(self):
+        self.canvas.update()
+
+    def paintEvent(self, event):
+        pass
+
+# Renders one frame of scene into an offscreen GL buffer and saves it, to
+# check the backend without a window, e.g. under LIBGL_ALWAYS_SOFTWARE=1
+def snapshot(path, scene, width=800, height=600, ticks=100):
+    stepper = Stepper(ScriptedCursor(circlePath(width/2, height/2, 200, 360)), seed=1)
+    scene.populate(stepper, width, height)
+    screen = QtCore.QRect(0, 0, width, height)
+    scene.confine(stepper, [screen])
+    stepper.run(ticks)
+    buffer = QtOpenGL.QGLPixelBuffer(width, height, glFormat())
+    buffer.makeCurrent()
+    renderer = FlockRenderer()
+    painter = QtGui.QPainter(buffer)
+    painter.beginNativePainting()
+    GL.glViewport(0, 0, width, height)
+    GL.glClearColor(0, 0, 0, 0)
+    GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+    renderer.draw(stepper.flock, 1.0, None, screen)
+    painter.endNativePainting()
+    stepper.draw(painter, 1.0, screen, [batch for batch in stepper.batches() if batch is not stepper.flock])
+    painter.end()
+    buffer.toImage().save(path)
+
+def main():
+    app = QtGui.QApplication(sys.argv)
+    args = app.arguments()[1:]
+    metricsPath = metricsOption(args)
+    if not QtOpenGL.QGLFormat.hasOpenGL():
+        sys.exit("no OpenGL available; run decorator.py instead")
+    if args and args[0] == 'snapshot':
+        snapshot(args[1], loadScene(args[2]) if len(args) > 2 else Scene())
+        return
+    overlays = screenOverlays(GLBoard, loadScene(args[0]) if args else None, metricsPath)
+    for t in overlays:
+        t.show()
+    sys.exit(app.exec_())
+
+if __name__ == '__main__':
+    main()
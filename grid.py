@@ -0,0 +1,221 @@
+from __future__ import division
+
+import numpy
+
+from follower import DISTANCE_ROOT
+
+# Cell coordinates are packed into one int64 key, x in the high half.
+KEY_SHIFT = 2**32
+
+# Up to this many grid points nearestK compares every point with all of them,
+# which beats walking cells around points far from the grid
+NEAREST_ALL = 32
+# Reach past which nearestK compares the points still looking with every grid
+# point instead.  Walking (2*reach + 1)**2 cells is quadratic in the reach, so
+# points far from a tight cluster of grid points would otherwise cost far more
+# than the cluster holds.
+NEAREST_REACH = 4
+# Distances nearestK works out at once when comparing with every grid point
+NEAREST_BLOCK = 2**18
+
+# Uniform grid over the plane for neighbour queries.  Agents are bucketed by
+# the cell they sit in, so everything within cellSize of an agent is in one of
+# the 3x3 cells around it.  rebuild() once per tick, then query as often as
+# needed.
+class SpatialGrid(object):
+
+    def __init__(self, cellSize=DISTANCE_ROOT):
+        self.cellSize = cellSize
+        self.x = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.keys = numpy.zeros(0, dtype=numpy.int64)
+        self.order = numpy.zeros(0, dtype=numpy.intp)
+        self.sortedKeys = numpy.zeros(0, dtype=numpy.int64)
+        # Distances worked out by the last query
+        self.checks = 0
+
+    def cellKeys(self, x, y):
+        cellX = numpy.floor(x/self.cellSize).astype(numpy.int64)
+        cellY = numpy.floor(y/self.cellSize).astype(numpy.int64)
+        return cellX*KEY_SHIFT + cellY
+
+    def rebuild(self, x, y):
+        self.x = x
+        self.y = y
+        self.keys = self.cellKeys(x, y)
+        self.order = numpy.argsort(self.keys, kind='mergesort')
+        self.sortedKeys = self.keys[self.order]
+
+    # Cells either side of an agent's own that can hold points within radius
+    def reach(self, radius):
+        return int(numpy.ceil(radius/self.cellSize))
+
+    # Every (i, j) with grid agent j in a cell within reach cells of keys[i]
+    def cellPairs(self, keys, reach):
+        agents = numpy.arange(len(keys))
+        pairsI = []
+        pairsJ = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                wanted = keys + dx*KEY_SHIFT + dy
+                lo = numpy.searchsorted(self.sortedKeys, wanted, 'left')
+                hi = numpy.searchsorted(self.sortedKeys, wanted, 'right')
+                counts = hi - lo
+                total = counts.sum()
+                if not total:
+                    continue
+                # Expand each [lo, hi) range into consecutive slots
+                first = numpy.cumsum(counts) - counts
+                slots = numpy.arange(total) + numpy.repeat(lo - first, counts)
+                pairsI.append(numpy.repeat(agents, counts))
+                pairsJ.append(self.order[slots])
+        if not pairsI:
+            empty = numpy.zeros(0, dtype=numpy.intp)
+            return empty, empty
+        return numpy.concatenate(pairsI), numpy.concatenate(pairsJ)
+
+    # Every (i, j) with j in a cell within reach cells of i's, i != j.
+    # agents, if given, limits i to those rows.
+    def candidatePairs(self, reach=1, agents=None):
+        if agents is None:
+            pairsI, pairsJ = self.cellPairs(self.keys, reach)
+        else:
+            pairsI, pairsJ = self.cellPairs(self.keys[agents], reach)
+            pairsI = agents[pairsI]
+        other = pairsI != pairsJ
+        return pairsI[other], pairsJ[other]
+
+    # Pairs closer than radius, with the offsets from j to i and their squares
+    def pairsWithin(self, radius, agents=None):
+        reach = self.reach(radius)
+        pairsI, pairsJ = self.candidatePairs(reach, agents)
+        self.checks = len(pairsI)
+        vectorRawX = self.x[pairsI] - self.x[pairsJ]
+        vectorRawY = self.y[pairsI] - self.y[pairsJ]
+        distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+        close = distance <= radius*radius
+        return (pairsI[close], pairsJ[close],
+                vectorRawX[close], vectorRawY[close], distance[close])
+
+    # Same contract as Flock.nearestNeighbours: offset from the nearest other
+    # agent within radius, and a mask of the agents that have one.  Agents
+    # left out of agents, if given, are not looked at and never clearing.
+    def nearest(self, radius, agents=None):
+        return closest(len(self.keys), *self.pairsWithin(radius, agents))
+
+    # The same for points that are not in the grid, such as the agents of
+    # another species: offset to each of x, y from the nearest grid agent
+    # within radius
+    def nearestTo(self, x, y, radius):
+        reach = self.reach(radius)
+        pairsI, pairsJ = self.cellPairs(self.cellKeys(x, y), reach)
+        self.checks = len(pairsI)
+        vectorRawX = x[pairsI] - self.x[pairsJ]
+        vectorRawY = y[pairsI] - self.y[pairsJ]
+        distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+        close = distance <= radius*radius
+        return closest(len(x), pairsI[close], pairsJ[close],
+                       vectorRawX[close], vectorRawY[close], distance[close])
+
+    # The k grid points nearest to each of x, y, as an (n, k) array of grid
+    # rows, nearest first, and the squared distances to them.  k is capped at
+    # the number of points.  The search starts in the 3x3 cells around each
+    # point and doubles its reach for the points whose k-th candidate could
+    # still be beaten by one outside the cells looked at, up to NEAREST_REACH;
+    # points that need more are compared with every grid point.  Cells are
+    # looked up once for all the points in them, so many points in few cells,
+    # such as a flock around a handful of attractors, cost little more than
+    # one each.
+    def nearestK(self, x, y, k):
+        n = len(x)
+        k = min(k, len(self.keys))
+        rows = numpy.zeros((n, k), dtype=numpy.intp)
+        distances = numpy.zeros((n, k))
+        if not k or not n:
+            return rows, distances
+        if len(self.keys) <= NEAREST_ALL:
+            return self.nearestAll(x, y, k)
+        keys = self.cellKeys(x, y)
+        # Reach beyond which a point's cells cover every grid point
+        cellX = numpy.floor(x/self.cellSize)
+        cellY = numpy.floor(y/self.cellSize)
+        gridX = numpy.floor(self.x/self.cellSize)
+        gridY = numpy.floor(self.y/self.cellSize)
+        covering = numpy.maximum.reduce([abs(cellX - gridX.min()), abs(cellX - gridX.max()),
+                                         abs(cellY - gridY.min()), abs(cellY - gridY.max())])
+        pending = numpy.arange(n)
+        reach = 1
+        while len(pending):
+            pairsI, pairsJ = self.sharedCellPairs(keys[pending], reach)
+            vectorRawX = x[pending][pairsI] - self.x[pairsJ]
+            vectorRawY = y[pending][pairsI] - self.y[pairsJ]
+            distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+            order = numpy.lexsort((distance, pairsI))
+            pairsI, pairsJ, distance = pairsI[order], pairsJ[order], distance[order]
+            counts = numpy.bincount(pairsI, minlength=len(pending))
+            first = numpy.cumsum(counts) - counts
+            rank = numpy.arange(len(pairsI)) - numpy.repeat(first, counts)
+            # Everything within reach cells of a point's own cell is at least
+            # reach*cellSize away from it in every direction
+            full = counts >= k
+            kth = numpy.full(len(pending), numpy.inf)
+            kth[full] = distance[first[full] + k - 1]
+            done = (kth <= (reach*self.cellSize)**2) | (covering[pending] <= reach)
+            taken = (rank < k) & done[pairsI]
+            rows[pending[pairsI[taken]], rank[taken]] = pairsJ[taken]
+            distances[pending[pairsI[taken]], rank[taken]] = distance[taken]
+            pending = pending[~done]
+            if len(pending):
+                reach = min(reach*2, int(covering[pending].max()))
+                if reach > NEAREST_REACH:
+                    rows[pending], distances[pending] = self.nearestAll(x[pending], y[pending], k)
+                    break
+        return rows, distances
+
+    # nearestK by comparing every point with every grid point, a block of
+    # points at a time
+    def nearestAll(self, x, y, k):
+        n = len(x)
+        rows = numpy.zeros((n, k), dtype=numpy.intp)
+        distances = numpy.zeros((n, k))
+        block = max(1, NEAREST_BLOCK//len(self.keys))
+        for start in range(0, n, block):
+            vectorRawX = x[start:start + block, None] - self.x[None, :]
+            vectorRawY = y[start:start + block, None] - self.y[None, :]
+            distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+            if k < len(self.keys):
+                nearest = numpy.argpartition(distance, k - 1, axis=1)[:, :k]
+            else:
+                nearest = numpy.broadcast_to(numpy.arange(k), distance.shape)
+            nearestDistance = numpy.take_along_axis(distance, nearest, axis=1)
+            order = numpy.argsort(nearestDistance, axis=1, kind='mergesort')
+            rows[start:start + block] = numpy.take_along_axis(nearest, order, axis=1)
+            distances[start:start + block] = numpy.take_along_axis(nearestDistance, order, axis=1)
+        return rows, distances
+
+    # cellPairs, looking up each distinct key once
+    def sharedCellPairs(self, keys, reach):
+        cells, cellOf = numpy.unique(keys, return_inverse=True)
+        cellI, cellJ = self.cellPairs(cells, reach)
+        order = numpy.argsort(cellI, kind='mergesort')
+        cellJ = cellJ[order]
+        cellCounts = numpy.bincount(cellI, minlength=len(cells))
+        cellFirst = numpy.cumsum(cellCounts) - cellCounts
+        counts = cellCounts[cellOf]
+        first = numpy.cumsum(counts) - counts
+        slots = numpy.arange(counts.sum()) + numpy.repeat(cellFirst[cellOf] - first, counts)
+        return numpy.repeat(numpy.arange(len(keys)), counts), cellJ[slots]
+
+# Reduces pairs to the nearest j for every i that has any
+def closest(n, pairsI, pairsJ, vectorRawX, vectorRawY, distance):
+    closestX = numpy.zeros(n)
+    closestY = numpy.zeros(n)
+    clearing = numpy.zeros(n, dtype=bool)
+    if len(pairsI):
+        order = numpy.lexsort((distance, pairsI))
+        agents, first = numpy.unique(pairsI[order], return_index=True)
+        best = order[first]
+        closestX[agents] = vectorRawX[best]
+        closestY[agents] = vectorRawY[best]
+        clearing[agents] = True
+    return closestX, closestY, clearing
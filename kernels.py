@@ -0,0 +1,128 @@
+from __future__ import division
+
+import math
+
+import numpy
+
+# Fused per-agent loops for the hot parts of Flock.navigate.  Each does in one
+# pass over the agents what the numpy path does with a dozen whole-flock
+# temporaries, and gives the same results: the arithmetic is done in the same
+# order, and there is no fastmath.  They are compiled with Numba when it is
+# installed, and the compiled code is cached next to this file so later
+# launches skip the compile.  Without Numba COMPILED is False, the functions
+# stay plain Python and Flock keeps to its numpy path.
+try:
+    from numba import njit
+    COMPILED = True
+except ImportError:
+    COMPILED = False
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+from grid import KEY_SHIFT
+from follower import STATE_NORMAL
+
+# Rows of the agents that come within distanceRoot of the target while
+# flying normally, in order, so the caller can pick them a turn direction
+@njit(cache=True)
+def enteringTarget(x, y, targetX, targetY, distanceRoot, state):
+    entering = numpy.empty(len(x), dtype=numpy.intp)
+    count = 0
+    for i in range(len(x)):
+        if state[i] == STATE_NORMAL and math.hypot(targetX - x[i], targetY - y[i]) <= distanceRoot:
+            entering[count] = i
+            count += 1
+    return entering[:count]
+
+# Flock.navigateToTarget once turns are picked
+@njit(cache=True)
+def steerToTarget(x, y, targetX, targetY, distanceRoot, movementFactor, weight,
+                  state, movement, xBuffer, yBuffer, updates):
+    for i in range(len(x)):
+        vectorX = targetX - x[i]
+        vectorY = targetY - y[i]
+        divisorUnit = math.hypot(vectorX, vectorY)
+        if divisorUnit > 0:
+            vectorX /= divisorUnit
+            vectorY /= divisorUnit
+        if state[i] != STATE_NORMAL:
+            vectorX, vectorY = state[i]*vectorY, -state[i]*vectorX
+            if movement[i] > movementFactor:
+                movement[i] -= 0.2
+            if divisorUnit > distanceRoot:
+                state[i] = STATE_NORMAL
+        else:
+            movement[i] = min(movement[i] + 0.1, movementFactor*2)
+        xBuffer[i] += vectorX*weight
+        yBuffer[i] += vectorY*weight
+        updates[i] += 1
+
+# Flock.navigateClear and navigateAround.  For each row in agents, finds the
+# nearest of the points in the grid (gridX, gridY, sortedKeys, order, as a
+# SpatialGrid holds them) within radius of (x, y), looking reach cells around
+# keys, and steers away from it.  With exclude an agent never avoids its own
+# row, for when the grid holds the agents themselves.  The cells are scanned in
+# the order SpatialGrid.cellPairs lists them, so ties go the same way.
+# Returns the number of distances worked out.
+@njit(cache=True)
+def steerClear(x, y, keys, gridX, gridY, sortedKeys, order, reach, radius,
+               agents, exclude, weight, xBuffer, yBuffer, updates):
+    limit = radius*radius
+    checks = 0
+    for i in agents:
+        closest = numpy.inf
+        closestX = 0.0
+        closestY = 0.0
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                wanted = keys[i] + dx*KEY_SHIFT + dy
+                lo = numpy.searchsorted(sortedKeys, wanted, 'left')
+                hi = numpy.searchsorted(sortedKeys, wanted, 'right')
+                for slot in range(lo, hi):
+                    j = order[slot]
+                    if exclude and j == i:
+                        continue
+                    vectorRawX = x[i] - gridX[j]
+                    vectorRawY = y[i] - gridY[j]
+                    distance = vectorRawX*vectorRawX + vectorRawY*vectorRawY
+                    checks += 1
+                    if distance <= limit and distance < closest:
+                        closest = distance
+                        closestX = vectorRawX
+                        closestY = vectorRawY
+        if closest == numpy.inf:
+            continue
+        divisorUnit = math.hypot(closestX, closestY)
+        if divisorUnit > 0:
+            closestX /= divisorUnit
+            closestY /= divisorUnit
+        xBuffer[i] += closestX*weight
+        yBuffer[i] += closestY*weight
+        updates[i] += 1
+    return checks
+
+# Flock.finalizeHeading, including clearing the buffers for the next tick
+@njit(cache=True)
+def finalizeHeading(xDirection, yDirection, movement, xBuffer, yBuffer, updates):
+    for i in range(len(xDirection)):
+        xBlend = (xBuffer[i]/updates[i] + xDirection[i])/2
+        yBlend = (yBuffer[i]/updates[i] + yDirection[i])/2
+        length = math.hypot(xBlend, yBlend)
+        if length > 0:
+            xNew = xBlend/length
+            yNew = yBlend/length
+        else:
+            xNew = 1.0
+            yNew = yBlend
+        dot = xDirection[i]*xNew + yDirection[i]*yNew
+        cross = xDirection[i]*yNew - yDirection[i]*xNew
+        if dot <= 0 or (yDirection[i]*yNew < 0 and cross*yDirection[i] > 0):
+            damping = 0.5
+        else:
+            damping = max(0.5, (math.pi - math.atan2(abs(cross), dot))/math.pi)
+        movement[i] = max(0.5, movement[i]*damping)
+        xDirection[i] = xNew
+        yDirection[i] = yNew
+        updates[i] = 0
+        xBuffer[i] = 0
+        yBuffer[i] = 0
@@ -0,0 +1,174 @@
+from __future__ import division
+
+import csv, json, time
+
+from PySide import QtCore, QtGui
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# Parts of a frame that are timed.  cursor and paint happen once per frame,
+# the rest once per tick inside Flock.navigate.
+PHASES = ('cursor', 'grid', 'centroid', 'steering', 'avoidance', 'finalize', 'paint')
+# Work counted per tick: distances worked out while looking for the nearest
+# neighbour, and candidate headings a dasher threw away before one cleared
+COUNTERS = ('neighbourChecks', 'dashRetries')
+
+# Seconds between two summaries, each shown on the HUD and written to the log
+REPORT_EVERY = 1.0
+
+# Top left corner of the HUD on every screen and the room it takes
+HUD_RECT = QtCore.QRect(8, 8, 280, 200)
+HUD_BACKGROUND = QtGui.QColor(0, 0, 0, 160)
+HUD_TEXT = QtGui.QColor(0xD9D9D1)
+
+# Times the phases of a frame and counts work done, over a window that
+# summary() averages and reset() restarts.  start() marks the beginning of a
+# phase and lap(phase) charges the time since the last mark to it, so a
+# sequence of phases costs one clock read each.
+class Metrics(object):
+
+    def __init__(self, clock=clock):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.samples = dict.fromkeys(PHASES, 0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.ticks = 0
+        self.frames = 0
+        self.began = self.mark = self.clock()
+
+    def start(self):
+        self.mark = self.clock()
+
+    def lap(self, phase):
+        now = self.clock()
+        self.totals[phase] += now - self.mark
+        self.samples[phase] += 1
+        self.mark = now
+
+    def count(self, counter, amount):
+        self.counts[counter] += amount
+
+    def tick(self, count=1):
+        self.ticks += count
+
+    def frame(self):
+        self.frames += 1
+
+    def due(self, every=REPORT_EVERY):
+        return self.clock() - self.began >= every
+
+    # One flat row for the window so far: milliseconds per run of each phase,
+    # counters per tick, and the tick and frame rates achieved
+    def summary(self):
+        seconds = max(self.clock() - self.began, 1e-9)
+        row = {'time': round(time.time(), 3), 'seconds': round(seconds, 3),
+               'tps': round(self.ticks/seconds, 1),
+               'fps': round(self.frames/seconds, 1)}
+        for phase in PHASES:
+            row[phase + 'Ms'] = round(1000*self.totals[phase]/max(self.samples[phase], 1), 3)
+        for counter in COUNTERS:
+            row[counter] = round(self.counts[counter]/max(self.ticks, 1), 1)
+        return row
+
+# Stands in for Metrics wherever nobody is watching, at the cost of a call
+class NullMetrics(object):
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, counter, amount):
+        pass
+
+    def tick(self, count=1):
+        pass
+
+NO_METRICS = NullMetrics()
+
+# Columns of a summary before any a board adds
+FIELDS = ['time', 'seconds', 'tps', 'fps'] + [phase + 'Ms' for phase in PHASES] + list(COUNTERS)
+
+def fieldOrder(row):
+    return [key for key in FIELDS if key in row] + sorted(key for key in row if key not in FIELDS)
+
+# Writes summaries to path, replacing any earlier log there, as CSV when it
+# ends in .csv and as one JSON object per line otherwise
+class MetricsLog(object):
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.writer = None
+        self.csv = path.lower().endswith('.csv')
+
+    def write(self, row):
+        if not self.csv:
+            self.file.write(json.dumps(row, sort_keys=True) + '\n')
+        else:
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.file, fieldOrder(row), lineterminator='\n')
+                self.writer.writeheader()
+            self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def hudLines(row):
+    lines = ['%.0f TPS  %.0f FPS' % (row['tps'], row['fps'])]
+    for phase in PHASES:
+        lines.append('%-10s %7.3f ms' % (phase, row[phase + 'Ms']))
+    lines.append('neighbour checks %.0f/tick' % row['neighbourChecks'])
+    lines.append('dash retries %.1f/tick' % row['dashRetries'])
+    for key in sorted(key for key in row if key not in FIELDS):
+        lines.append('%s %s' % (key, row[key]))
+    return lines
+
+# What a board shows of its Metrics: summarizes them every REPORT_EVERY
+# seconds, writes each summary to the log, if any, and draws the latest in the
+# corner when shown
+class Hud(object):
+
+    def __init__(self, metrics, log=None):
+        self.metrics = metrics
+        self.log = log
+        self.shown = False
+        self.lines = []
+
+    def toggle(self):
+        self.shown = not self.shown
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    # extra adds the board's own settings to the summary.  Returns True when
+    # there is a new summary to show.
+    def update(self, extra=None):
+        if not self.metrics.due():
+            return False
+        row = self.metrics.summary()
+        if extra:
+            row.update(extra)
+        self.metrics.reset()
+        if self.log is not None:
+            self.log.write(row)
+        self.lines = hudLines(row)
+        return self.shown
+
+    # painter in widget coordinates
+    def draw(self, painter):
+        if not self.shown:
+            return
+        painter.save()
+        painter.fillRect(HUD_RECT, HUD_BACKGROUND)
+        painter.setPen(HUD_TEXT)
+        painter.setFont(QtGui.QFont('Monospace', 8))
+        painter.drawText(HUD_RECT.adjusted(6, 4, -6, -4), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop,
+                         '\n'.join(self.lines or ['measuring...']))
+        painter.restore()
@@ -0,0 +1,179 @@
+from __future__ import division
+
+import numpy
+
+from follower import DISTANCE_ROOT
+
+# Side of a map cell in pixels
+MAP_CELL = 8
+# Cells of blocked border around the screens, so agents that got out are
+# still pointed back in
+MAP_MARGIN = 4
+# Agents closer than this to a wall, or past it, steer away from it
+MAP_REACH = DISTANCE_ROOT*2
+# Most the push from a wall grows, relative to the push right at it, for
+# agents deep past it
+MAP_PUSH = 2
+
+# Distances into the free space past this many cells read as this many.
+# Only agents within MAP_REACH of a wall steer at all, and the direction away
+# from it only needs one cell more either side of them.
+MAP_CAP = int(numpy.ceil(MAP_REACH/MAP_CELL)) + 2
+
+# Distance in cells from every cell of the 2D boolean mask to the nearest
+# True cell: exact Euclidean distances, worked out along the rows and then
+# down the columns.  With a limit, only rows up to limit away are searched:
+# distances up to limit are still exact and longer ones come out longer than
+# limit, but not exact.  The search also stops once every cell has a True
+# cell closer than the rows still to be looked at.
+def distanceTo(mask, limit=None):
+    height, width = mask.shape
+    along = numpy.where(mask, 0.0, height + width)
+    for column in range(1, width):
+        numpy.minimum(along[:, column], along[:, column - 1] + 1, out=along[:, column])
+    for column in range(width - 2, -1, -1):
+        numpy.minimum(along[:, column], along[:, column + 1] + 1, out=along[:, column])
+    squared = along*along
+    best = squared.copy()
+    reach = height - 1 if limit is None else min(limit, height - 1)
+    check = 1
+    for offset in range(1, reach + 1):
+        numpy.minimum(best[offset:], squared[:-offset] + offset*offset, out=best[offset:])
+        numpy.minimum(best[:-offset], squared[offset:] + offset*offset, out=best[:-offset])
+        if offset == check:
+            if best.max() <= offset*offset:
+                break
+            check *= 2
+    return numpy.sqrt(best)
+
+# Slice of the cells from start to stop grown by cells either side, within size
+def grown(start, stop, cells, size):
+    return slice(max(0, start - cells), min(size, stop + cells))
+
+# Signed distance field over the desktop, precomputed on a grid of MAP_CELL
+# cells: positive and the distance to the nearest wall in the free space,
+# which is the screens less the window rectangles, negative and the distance
+# back to it everywhere else.  With it stored alongside the direction away
+# from the nearest wall, steering clear of every screen edge and window is
+# one lookup per agent however many there are.  Points off the map read the
+# border cell nearest them, which points back in.  Distances into the free
+# space are capped at MAP_CAP cells, so moving a window only changes the map
+# near it, and setWindows() works out just that part again.
+class ObstacleMap(object):
+
+    # screens and windows are QRects in desktop coordinates
+    def __init__(self, screens, windows=(), cell=MAP_CELL, margin=MAP_MARGIN):
+        self.screens = list(screens)
+        self.cell = cell
+        self.margin = margin
+        left = min(screen.left() for screen in self.screens) - margin*cell
+        top = min(screen.top() for screen in self.screens) - margin*cell
+        right = max(screen.right() + 1 for screen in self.screens) + margin*cell
+        bottom = max(screen.bottom() + 1 for screen in self.screens) + margin*cell
+        self.left, self.top = left, top
+        self.columns = int(numpy.ceil((right - left)/cell))
+        self.rows = int(numpy.ceil((bottom - top)/cell))
+
+        # Free cells are those whose centres are on a screen and in no window
+        self.xCenter = left + (numpy.arange(self.columns) + 0.5)*cell
+        self.yCenter = top + (numpy.arange(self.rows) + 0.5)*cell
+        self.onScreen = numpy.zeros((self.rows, self.columns), dtype=bool)
+        for screen in self.screens:
+            self.onScreen |= self.inside(screen)
+
+        self.windows = list(windows)
+        self.free = self.freeCells(self.windows)
+        self.distance = numpy.zeros((self.rows, self.columns))
+        self.table = numpy.zeros((self.rows*self.columns, 3))
+        self.refresh(slice(0, self.rows), slice(0, self.columns))
+
+    def freeCells(self, windows):
+        free = self.onScreen.copy()
+        for window in windows:
+            free &= ~self.inside(window)
+        return free
+
+    # Windows move; the map is worked out again around the cells they freed
+    # or covered
+    def setWindows(self, windows):
+        self.windows = list(windows)
+        free = self.freeCells(self.windows)
+        changedRows, changedColumns = numpy.nonzero(free != self.free)
+        self.free = free
+        if not len(changedRows):
+            return
+        top, bottom = changedRows.min(), changedRows.max() + 1
+        first, last = changedColumns.min(), changedColumns.max() + 1
+
+        # A cell keeps its distance unless the changed cells are closer to it
+        # than its nearest wall, or its way back in, was
+        rowGap = numpy.maximum(0, numpy.maximum(top - numpy.arange(self.rows), numpy.arange(self.rows) - bottom + 1))
+        columnGap = numpy.maximum(0, numpy.maximum(first - numpy.arange(self.columns), numpy.arange(self.columns) - last + 1))
+        gap = numpy.hypot(rowGap[:, None], columnGap[None, :])
+        depth = numpy.abs(self.distance)/self.cell + 0.5
+        grow = int(numpy.ceil(max(MAP_CAP, gap[depth >= gap].max()))) + 1
+        rows = grown(top, bottom, grow, self.rows)
+        columns = grown(first, last, grow, self.columns)
+
+        # Walls are looked for as far around those cells as the way back in
+        # was deep there, and farther while it turns out deeper now
+        reach = max(grow, int(numpy.ceil(depth[rows, columns].max())) + 1)
+        deepest = self.refresh(rows, columns, reach)
+        while deepest > reach:
+            reach = max(reach*2, int(numpy.ceil(deepest)))
+            if reach >= max(self.rows, self.columns):
+                self.refresh(slice(0, self.rows), slice(0, self.columns))
+                break
+            deepest = self.refresh(rows, columns, reach)
+
+    # Works out the distances and directions of the cells in rows, columns
+    # from the walls up to reach cells around them, or from every wall without
+    # a reach.  Returns the longest way back in from any of them, in cells;
+    # when that is more than reach nothing changes, as it could be shorter
+    # through cells not looked at.
+    def refresh(self, rows, columns, reach=None):
+        if reach is None:
+            outerRows, outerColumns = rows, columns
+        else:
+            outerRows = grown(rows.start, rows.stop, reach, self.rows)
+            outerColumns = grown(columns.start, columns.stop, reach, self.columns)
+        free = self.free[outerRows, outerColumns]
+        inner = (slice(rows.start - outerRows.start, rows.stop - outerRows.start),
+                 slice(columns.start - outerColumns.start, columns.stop - outerColumns.start))
+
+        back = distanceTo(free, reach)
+        blocked = ~free[inner]
+        deepest = back[inner][blocked].max() if blocked.any() else 0.0
+        if reach is not None and deepest > reach:
+            return deepest
+        away = numpy.minimum(distanceTo(~free, MAP_CAP), MAP_CAP)
+        # Half a cell either side puts the zero on the boundary between cells
+        distance = numpy.where(free, away - 0.5, 0.5 - back)*self.cell
+        self.distance[rows, columns] = distance[inner]
+
+        # The direction away from the wall, from the distances one cell around
+        aroundRows = grown(rows.start, rows.stop, 1, self.rows)
+        aroundColumns = grown(columns.start, columns.stop, 1, self.columns)
+        yAway, xAway = numpy.gradient(self.distance[aroundRows, aroundColumns])
+        length = numpy.hypot(xAway, yAway)
+        length[length == 0] = 1
+        within = (slice(rows.start - aroundRows.start, rows.stop - aroundRows.start),
+                  slice(columns.start - aroundColumns.start, columns.stop - aroundColumns.start))
+        table = self.table.reshape(self.rows, self.columns, 3)
+        table[rows, columns, 0] = self.distance[rows, columns]
+        table[rows, columns, 1] = (xAway/length)[within]
+        table[rows, columns, 2] = (yAway/length)[within]
+        return deepest
+
+    def inside(self, rect):
+        columns = (self.xCenter >= rect.left()) & (self.xCenter <= rect.right() + 1)
+        rows = (self.yCenter >= rect.top()) & (self.yCenter <= rect.bottom() + 1)
+        return rows[:, None] & columns[None, :]
+
+    # Signed distance to the nearest wall from each of the points x, y, and
+    # the unit vector pointing away from it
+    def lookup(self, x, y):
+        column = numpy.clip(((x - self.left)//self.cell).astype(numpy.intp), 0, self.columns - 1)
+        row = numpy.clip(((y - self.top)//self.cell).astype(numpy.intp), 0, self.rows - 1)
+        values = self.table[row*self.columns + column]
+        return values[:, 0], values[:, 1], values[:, 2]
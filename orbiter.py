@@ -1,38 +1,211 @@
+from __future__ import division
+
 from PySide import QtCore, QtGui
 
 import math, random
 
+import numpy
+
+from follower import rowAttribute
+
 DISTANCE_AVERSION = 25*25
 
-class Orbiter(object):
-    def __init__(self, rateOrbital=None, sizePlanet=3, widthX=None, widthY=None ):
+# Angles are kept in sixteenths of a degree, as QPainter arcs use
+ORBIT_STEPS = 5760
+# Orbits are centred this far left of the cursor
+FOCUS_X = -65
+FOCUS_OFFSET = QtCore.QPointF(FOCUS_X, 0)
+
+# Unit circle at every sixteenth of a degree.  An orbit position is a lookup
+# here scaled by the orbit's two radii.
+orbitCos = numpy.cos(numpy.radians(numpy.arange(ORBIT_STEPS)/16))
+orbitSin = numpy.sin(numpy.radians(numpy.arange(ORBIT_STEPS)/16))
+
+colorTable = [0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
+              0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]
+
+# Struct-of-arrays state for a set of Orbiters sharing one focus.  The orbit
+# rings never change shape, so they are rendered once into a layer that is
+# blitted at the focus each frame; only the planets are drawn fresh.
+class OrbitSystem(object):
+
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.capacity = 0
+        self.views = []
+        self.colors = []
         self.target = QtCore.QPointF(0, 0)
-        self.angle = random.randint(0, 5760) #16ths of a degree
-        self.widthMajor = random.randint(0, 100) if widthX is None else widthX
-        self.widthMinor = self.widthMajor + random.randint(-5, 5) if widthY is None else widthY
-        self.rate = random.choice((.25, .5, 1, 1.25, 1.5, 2, 3, 5)) if rateOrbital is None else rateOrbital
-        self.size = sizePlanet
-        self.color = QtGui.QColor(random.choice([0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
-                      0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00]))
-        
+        self.layer = None
+        self.angle = numpy.zeros(0)
+        self.rate = numpy.zeros(0)
+        self.widthMajor = numpy.zeros(0)
+        self.widthMinor = numpy.zeros(0)
+        self.size = numpy.zeros(0)
+        self.reserve(capacity)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name in ('angle', 'rate', 'widthMajor', 'widthMinor', 'size'):
+            old = getattr(self, name)
+            new = numpy.zeros(capacity)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def addRow(self, angle, rate, widthMajor, widthMinor, size, color):
+        if self.count == self.capacity:
+            self.reserve(max(16, self.capacity*2))
+        i = self.count
+        self.count += 1
+        self.angle[i] = angle
+        self.rate[i] = rate
+        self.widthMajor[i] = widthMajor
+        self.widthMinor[i] = widthMinor
+        self.size[i] = size
+        self.colors.append(color)
+        self.layer = None
+        return i
+
+    def spawn(self, rateOrbital=None, sizePlanet=3, widthX=None, widthY=None):
+        angle = random.randint(0, ORBIT_STEPS)
+        widthMajor = random.randint(0, 100) if widthX is None else widthX
+        widthMinor = widthMajor + random.randint(-5, 5) if widthY is None else widthY
+        rate = random.choice((.25, .5, 1, 1.25, 1.5, 2, 3, 5)) if rateOrbital is None else rateOrbital
+        color = QtGui.QColor(random.choice(colorTable))
+        view = Orbiter(system=self, index=self.addRow(angle, rate, widthMajor, widthMinor, sizePlanet, color))
+        self.views.append(view)
+        return view
+
+    # Moves an existing Orbiter, such as one of the sol planets, into this system
+    def adopt(self, orbiter):
+        orbiter.index = self.addRow(orbiter.angle, orbiter.rate, orbiter.widthMajor,
+                                    orbiter.widthMinor, orbiter.size, orbiter.color)
+        orbiter.system = self
+        self.views.append(orbiter)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.views)
+
     def navigate(self, target):
+        n = self.count
         self.target = target
-        self.angle = (self.angle + 16* self.rate)%5760
+        self.angle[:n] = (self.angle[:n] + 16*self.rate[:n]) % ORBIT_STEPS
+
+    def focus(self):
+        return self.target.x() + FOCUS_X, self.target.y()
+
+    def positions(self):
+        n = self.count
+        step = self.angle[:n].astype(int) % ORBIT_STEPS
+        xFocus, yFocus = self.focus()
+        return xFocus + self.widthMajor[:n]*orbitCos[step], yFocus + self.widthMinor[:n]*orbitSin[step]
+
+    # Half the side of the ring layer, enough for the widest ring and its pen
+    def reach(self):
+        n = self.count
+        if not n:
+            return 0
+        return int(math.ceil(max(self.widthMajor[:n].max(), self.widthMinor[:n].max()))) + 2
+
+    def ringLayer(self):
+        if self.layer is None:
+            reach = self.reach()
+            self.layer = QtGui.QPixmap(2*reach + 1, 2*reach + 1)
+            self.layer.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(self.layer)
+            center = QtCore.QPointF(reach, reach)
+            for i in range(self.count):
+                painter.setPen(self.colors[i])
+                painter.drawEllipse(center, self.widthMajor[i], self.widthMinor[i])
+            painter.end()
+        return self.layer
+
+    # alpha is accepted for the Stepper's sake; planets move too little per
+    # tick to need interpolating.  rows, if given, picks the planets to draw;
+    # the rings are one blit either way.
+    def draw(self, painter, target, alpha=1.0, rows=None):
+        if not self.count:
+            return
+        reach = self.reach()
+        xFocus, yFocus = self.focus()
+        painter.drawPixmap(int(xFocus) - reach, int(yFocus) - reach, self.ringLayer())
+        x, y = self.positions()
+        size = self.size[:self.count]
+        colors = self.colors
+        if rows is not None:
+            x, y, size = x[rows], y[rows], size[rows]
+            colors = [colors[i] for i in rows.tolist()]
+        for color, x, y, size in zip(colors, x.tolist(), y.tolist(), size.tolist()):
+            painter.setPen(color)
+            painter.drawEllipse(QtCore.QPoint(x, y), size, size)
+
+    # (n, 4) array of left, top, right, bottom around every orbit
+    def bounds(self):
+        n = self.count
+        xFocus, yFocus = self.focus()
+        xReach = self.widthMajor[:n] + self.size[:n]
+        yReach = self.widthMinor[:n] + self.size[:n]
+        return numpy.column_stack((xFocus - xReach, yFocus - yReach, xFocus + xReach, yFocus + yReach))
+
+# An Orbiter is a view over one row of an OrbitSystem.  Constructed on its own
+# it gets a private single-planet system.
+class Orbiter(object):
+    def __init__(self, rateOrbital=None, sizePlanet=3, widthX=None, widthY=None, system=None, index=None):
+        if system is None:
+            system = OrbitSystem(1)
+            index = system.spawn(rateOrbital, sizePlanet, widthX, widthY).index
+            system.views[index] = self
+        self.system = system
+        self.index = index
+
+    angle = rowAttribute('angle', owner='system')
+    rate = rowAttribute('rate', owner='system')
+    widthMajor = rowAttribute('widthMajor', owner='system')
+    widthMinor = rowAttribute('widthMinor', owner='system')
+    size = rowAttribute('size', owner='system')
+
+    @property
+    def color(self):
+        return self.system.colors[self.index]
+
+    @color.setter
+    def color(self, value):
+        self.system.colors[self.index] = value
+        self.system.layer = None
+
+    @property
+    def target(self):
+        return self.system.target
+
+    def navigate(self, target):
+        self.system.target = target
+        self.angle = (self.angle + 16* self.rate)%ORBIT_STEPS
+
+    def bounds(self):
+        x = self.target.x() + FOCUS_X
+        y = self.target.y()
+        return (x - self.widthMajor - self.size, y - self.widthMinor - self.size,
+                x + self.widthMajor + self.size, y + self.widthMinor + self.size)
 
     def draw(self, painter, target):
         color = self.color
         painter.setPen(color)
 
-        focus = self.target + QtCore.QPointF(-65, 0)
-        
+        focus = self.target + FOCUS_OFFSET
+
         painter.drawEllipse(focus, 1.0*self.widthMajor, 1.0*self.widthMinor)
 
-        x = self.target.x()-65 + self.widthMajor*math.cos(self.angle/16*math.pi/180)
-        y = self.target.y() + self.widthMinor*math.sin(self.angle/16*math.pi/180)
+        step = int(self.angle) % ORBIT_STEPS
+        x = focus.x() + self.widthMajor*orbitCos[step]
+        y = focus.y() + self.widthMinor*orbitSin[step]
 
         painter.drawEllipse(QtCore.QPoint(x, y), self.size, self.size)
 
-        
+
         #painter.drawLine(self.x, self.y, self.xOld, self.yOld)
 
 pEarth = Orbiter(1, 3, 76, 75)
@@ -54,5 +227,3 @@ pNeptune = Orbiter(.007, 5, 382, 382)
 pNeptune.color = QtGui.QColor(0x00AAFF)
 
 sol = (pMercury, pVenus, pEarth, pMars, pJupiter, pSaturn, pUranus, pNeptune)
-
-
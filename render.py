@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import argparse, os, shlex, subprocess, sys, threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy
+
+from PySide import QtCore, QtGui
+
+from clock import FixedStep
+from cursor import ScriptedCursor, circlePath
+from cursortrace import ReplayCursor, loadTrace
+from scene import Scene, loadScene
+from stepper import Stepper
+
+WIDTH = 800
+HEIGHT = 600
+FPS = 30
+# Frames painted ahead of the writer before painting waits for it
+QUEUE_DEPTH = 8
+FORMATS = ('raw', 'png', 'pipe', 'sheet')
+# Most frames a sheet holds, as the whole sheet is kept in memory until it is
+# saved, and its default length
+SHEET_FRAMES = 64
+
+# Premultiplied BGRA, as QImage keeps ARGB32 in memory, to straight RGBA, as
+# encoders expect it
+def straightRGBA(frame):
+    rgba = frame[..., [2, 1, 0, 3]].astype(numpy.uint16)
+    alpha = rgba[..., 3:]
+    shown = alpha[..., 0] > 0
+    rgba[shown, :3] = numpy.minimum(255, (rgba[shown, :3]*255 + alpha[shown]//2)//alpha[shown])
+    return rgba.astype(numpy.uint8)
+
+def frameImage(frame):
+    height, width = frame.shape[:2]
+    return QtGui.QImage(frame.data, width, height, QtGui.QImage.Format_ARGB32_Premultiplied).copy()
+
+# Sinks take one (height, width, 4) BGRA premultiplied frame per write()
+
+# Every frame's straight RGBA bytes back to back in one file
+class RawWriter(object):
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def write(self, frame):
+        self.file.write(straightRGBA(frame).tobytes())
+
+    def close(self):
+        self.file.close()
+
+# One PNG per frame, named by filling the frame number into pattern
+class PngWriter(object):
+    def __init__(self, pattern):
+        if '%' not in pattern:
+            pattern = os.path.join(pattern, 'frame%05d.png')
+        directory = os.path.dirname(pattern)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.pattern = pattern
+        self.frames = 0
+
+    def write(self, frame):
+        frameImage(frame).save(self.pattern % self.frames)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+# Straight RGBA frames into the standard input of an encoder, for example
+# ffmpeg -f rawvideo -pix_fmt rgba -s 800x600 -r 30 -i - out.mp4
+class PipeWriter(object):
+    def __init__(self, command):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(straightRGBA(frame).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError("encoder exited with status %d" % self.process.returncode)
+
+# Up to frames frames as the cells of a single PNG grid, columns cells wide.
+# Each frame is copied into its cell as it arrives, into a sheet allocated
+# for all of them with the first.
+class SheetWriter(object):
+    def __init__(self, path, columns, frames):
+        self.path = path
+        self.columns = min(columns, frames)
+        self.capacity = frames
+        self.frames = 0
+        self.sheet = None
+
+    def write(self, frame):
+        if self.frames == self.capacity:
+            raise ValueError("sheet already holds %d frames" % self.capacity)
+        height, width = frame.shape[:2]
+        if self.sheet is None:
+            self.height = height
+            rows = (self.capacity + self.columns - 1)//self.columns
+            self.sheet = numpy.zeros((rows*height, self.columns*width, 4), dtype=numpy.uint8)
+        row, column = divmod(self.frames, self.columns)
+        self.sheet[row*height:(row + 1)*height, column*width:(column + 1)*width] = frame
+        self.frames += 1
+
+    def close(self):
+        if not self.frames:
+            return
+        # Rows no frame reached are left off
+        rows = (self.frames + self.columns - 1)//self.columns
+        frameImage(self.sheet[:rows*self.height]).save(self.path)
+
+# Hands frames to a sink on its own thread, so writing and encoding overlap
+# painting the next frame.  put() blocks once depth frames are waiting.
+class FrameWriter(threading.Thread):
+
+    def __init__(self, sink, depth=QUEUE_DEPTH):
+        super(FrameWriter, self).__init__()
+        self.daemon = True
+        self.sink = sink
+        self.frames = queue.Queue(depth)
+        self.error = None
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is None:
+                try:
+                    self.sink.write(frame)
+                except Exception as e:
+                    self.error = e
+
+    def put(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+
+    def close(self):
+        self.frames.put(None)
+        self.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+# Steps stepper at its own tick rate and paints every 1/fps seconds of
+# simulated time into image, handing a copy of each frame to writer.  The
+# frames are interpolated between ticks as on screen.
+def renderFrames(stepper, image, writer, frames, tps, fps=FPS):
+    elapsed = [0.0]
+    clock = FixedStep(tps, lambda: elapsed[0])
+    width, height = image.width(), image.height()
+    for i in range(frames):
+        for step in range(clock.advance()):
+            stepper.tick()
+        image.fill(0)
+        painter = QtGui.QPainter(image)
+        stepper.draw(painter, clock.alpha())
+        painter.end()
+        bits = numpy.frombuffer(image.constBits(), dtype=numpy.uint8, count=width*height*4)
+        writer.put(bits.reshape(height, width, 4).copy())
+        elapsed[0] += 1/fps
+
+def openSink(args):
+    if args.format == 'raw':
+        return RawWriter(args.output)
+    if args.format == 'png':
+        return PngWriter(args.output)
+    if args.format == 'pipe':
+        return PipeWriter(args.output)
+    return SheetWriter(args.output, args.columns, args.frames)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a scene offscreen to frames on disk or an encoder")
+    parser.add_argument('output', help="file, PNG pattern or directory, or encoder command for pipe")
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--scene', help="scene file, see scenes/")
+    parser.add_argument('--trace', help="cursor trace from cursortrace.py, one sample per tick")
+    parser.add_argument('--frames', type=int,
+                        help="frames to render, by default %d, or %d for a sheet" % (FPS*10, SHEET_FRAMES))
+    parser.add_argument('--fps', type=int, default=FPS)
+    parser.add_argument('--size', default='%dx%d' % (WIDTH, HEIGHT))
+    parser.add_argument('--columns', type=int, default=8, help="sprite sheet width in frames")
+    parser.add_argument('--queue', type=int, default=QUEUE_DEPTH, help="frames painted ahead of the writer")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if args.frames is None:
+        args.frames = SHEET_FRAMES if args.format == 'sheet' else FPS*10
+    if args.format == 'sheet' and args.frames > SHEET_FRAMES:
+        parser.error("a sheet holds at most %d frames" % SHEET_FRAMES)
+
+    app = QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+    width, height = [int(side) for side in args.size.split('x')]
+    scene = loadScene(args.scene) if args.scene else Scene()
+    if args.trace:
+        cursor = ReplayCursor(loadTrace(args.trace))
+    else:
+        cursor = ScriptedCursor(circlePath(width/2, height/2, min(width, height)/3, scene.tps*4))
+    stepper = Stepper(cursor, seed=args.seed)
+    scene.populate(stepper, width, height)
+    scene.confine(stepper, [QtCore.QRect(0, 0, width, height)])
+
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+    writer = FrameWriter(openSink(args), args.queue)
+    writer.start()
+    try:
+        renderFrames(stepper, image, writer, args.frames, scene.tps, args.fps)
+    finally:
+        writer.close()
+
+if __name__ == '__main__':
+    main()
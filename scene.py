@@ -0,0 +1,152 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import io, json, os
+
+from PySide import QtCore
+
+from attractor import CURSOR, NEAREST_ATTRACTORS
+from clock import MIN_FPS, IDLE_AFTER, FREEZE_AFTER
+from cursor import ScriptedCursor, waypointPath
+from dasher import DasherBatch
+from flock import Flock
+from orbiter import sol
+
+# Defaults of a scene file, and the scene used when none is given
+NUM_BIOTS = 8
+TPS = 45
+FPS = 60
+AGENTS = ({'type': 'follower', 'count': NUM_BIOTS},)
+
+# Agent types a scene can ask for, by the name used in its 'type' keys.  Each
+# entry is a function adding count agents of that type to a Stepper, inside
+# the width x height area from left, top, with the remaining keys of the scene
+# entry as keyword arguments.
+SPECIES = {}
+
+def species(name):
+    def register(populate):
+        SPECIES[name] = populate
+        return populate
+    return register
+
+# Settings like cohesionRadius or focusOnGoal belong to a whole batch, so they
+# can only be given while the batch is still empty
+def emptyBatch(batch, name, params):
+    if params and len(batch):
+        raise ValueError("%s settings %s must come with the first %s entry" % (name, sorted(params), name))
+
+# avoid lists the species the followers steer clear of, such as ["dasher"]
+@species('follower')
+def populateFollowers(stepper, count, width, height, left=0, top=0, avoid=(), **params):
+    for name in avoid:
+        if name not in SPECIES or name == 'follower':
+            raise ValueError("followers cannot avoid agent type %r" % name)
+        if name not in stepper.avoided:
+            stepper.avoided.append(name)
+    emptyBatch(stepper.flock, 'follower', params)
+    if params:
+        stepper.flock = Flock(count, **params)
+    stepper.spawnFollowers(count, width, height, left, top)
+
+@species('dasher')
+def populateDashers(stepper, count, width, height, left=0, top=0, **params):
+    emptyBatch(stepper.dashers, 'dasher', params)
+    if params:
+        stepper.dashers = DasherBatch(count, **params)
+    stepper.spawnDashers(count)
+
+@species('orbiter')
+def populateOrbiters(stepper, count, width, height, left=0, top=0):
+    stepper.spawnOrbiters(count)
+
+# The planets of orbiter.sol; count is ignored since there is only one set
+@species('sol')
+def populateSol(stepper, count, width, height, left=0, top=0):
+    stepper.addOrbiters(sol)
+
+# Adds the attractor an entry of a scene's attractors list describes: an x
+# and y, a weight and a falloff in pixels, and optionally "cursor": true to sit
+# on the cursor or "waypoints": [[x, y], ...] with a "speed" in pixels per
+# sample to walk them
+def addAttractor(stepper, entry):
+    params = dict(entry)
+    source = None
+    if params.pop('cursor', False):
+        source = CURSOR
+    if 'waypoints' in params:
+        waypoints = [tuple(point) for point in params.pop('waypoints')]
+        source = ScriptedCursor(waypointPath(waypoints, params.pop('speed', 1)))
+        params.setdefault('x', waypoints[0][0])
+        params.setdefault('y', waypoints[0][1])
+    unknown = set(params) - set(('x', 'y', 'weight', 'falloff'))
+    if unknown:
+        raise ValueError("unknown attractor settings %s" % sorted(unknown))
+    return stepper.attractors.add(source=source, **params)
+
+# A parsed scene file: the tick and frame rates, the seconds of a still
+# cursor before the overlay idles and freezes (null for never), plus a list
+# of agent entries, each a dict with a 'type' from SPECIES, a 'count' and
+# that type's settings.  attractors, if any, replace the cursor as what the
+# followers steer towards, each follower blending the nearest
+# nearestAttractors of them; see addAttractor for their entries.
+# keepOnScreen holds the followers on the screens and out of the windows,
+# each an [x, y, width, height] rectangle in desktop coordinates.
+class Scene(object):
+
+    def __init__(self, tps=TPS, fps=FPS, minFps=MIN_FPS, agents=AGENTS,
+                 idleAfter=IDLE_AFTER, freezeAfter=FREEZE_AFTER,
+                 attractors=(), nearestAttractors=NEAREST_ATTRACTORS,
+                 keepOnScreen=True, windows=()):
+        self.tps = tps
+        self.fps = fps
+        self.minFps = minFps
+        self.idleAfter = idleAfter
+        self.freezeAfter = freezeAfter
+        self.attractors = [dict(entry) for entry in attractors]
+        self.nearestAttractors = nearestAttractors
+        self.keepOnScreen = keepOnScreen
+        self.windows = [QtCore.QRect(*window) for window in windows]
+        self.agents = [dict(entry) for entry in agents]
+        for entry in self.agents:
+            if entry.get('type') not in SPECIES:
+                raise ValueError("unknown agent type %r, expected one of %s" % (entry.get('type'), sorted(SPECIES)))
+
+    # Total agents of one type the scene asks for
+    def count(self, name):
+        return sum(entry.get('count', 0) for entry in self.agents if entry['type'] == name)
+
+    # screens are the QRects the stepper's agents are shown on
+    def confine(self, stepper, screens):
+        if self.keepOnScreen:
+            stepper.keepInside(screens, self.windows)
+
+    # Followers spawn inside width x height from left, top
+    def populate(self, stepper, width, height, left=0, top=0):
+        for entry in self.agents:
+            params = dict(entry)
+            populate = SPECIES[params.pop('type')]
+            populate(stepper, params.pop('count', 0), width, height, left, top, **params)
+        stepper.attractors.nearest = self.nearestAttractors
+        for entry in self.attractors:
+            addAttractor(stepper, entry)
+
+def parseToml(text):
+    try:
+        import tomllib
+    except ImportError:
+        import toml as tomllib
+    return tomllib.loads(text)
+
+# Scene files are JSON, or TOML when a TOML parser is installed.  The format
+# follows the file extension.
+def loadScene(path):
+    with io.open(path, encoding='utf-8') as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() == '.toml':
+        settings = parseToml(text)
+    else:
+        settings = json.loads(text)
+    return Scene(**settings)
@@ -0,0 +1,104 @@
+from __future__ import division
+
+from PySide import QtCore, QtGui
+
+import math
+
+import numpy
+
+from follower import SQUARE_SIZE, colorTable
+
+HEADING_STEPS = 32
+
+# Draws one Follower the way Follower.draw does, centred on (center, center)
+def renderFollower(painter, color, angle, center):
+    painter.setPen(color)
+    painter.drawEllipse(QtCore.QPoint(center, center), SQUARE_SIZE, SQUARE_SIZE)
+    painter.setPen(color.darker())
+    painter.drawArc(center-SQUARE_SIZE+1, center-SQUARE_SIZE+1,
+                    SQUARE_SIZE*2-2, SQUARE_SIZE*2-2,
+                    (-angle+270)*16, (-180)*16)
+
+# The same without the shading arc, so one cell serves every heading
+def renderFlat(painter, color, angle, center):
+    painter.setPen(color)
+    painter.drawEllipse(QtCore.QPoint(center, center), SQUARE_SIZE, SQUARE_SIZE)
+
+# Pre-rendered sprites for every (color, heading) combination, one row of
+# HEADING_STEPS cells per color in a single QPixmap.  Painting an agent is a
+# single drawPixmap from the right cell instead of a pen change per primitive.
+# Rows for colors outside the initial set are rendered the first time they
+# are drawn.
+class SpriteAtlas(object):
+
+    def __init__(self, render=renderFollower, radius=SQUARE_SIZE, colors=colorTable, steps=HEADING_STEPS):
+        self.render = render
+        self.steps = steps
+        self.center = radius + 1
+        self.cell = 2*self.center + 1
+        self.rows = {}
+        self.pixmap = QtGui.QPixmap(self.cell*steps, 0)
+        self.addRows([QtGui.QColor(color) for color in colors])
+
+    def addRows(self, colors):
+        colors = [color for color in colors if color.rgba() not in self.rows]
+        if not colors:
+            return
+        first = len(self.rows)
+        pixmap = QtGui.QPixmap(self.cell*self.steps, self.cell*(first + len(colors)))
+        pixmap.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(pixmap)
+        if first:
+            painter.drawPixmap(0, 0, self.pixmap)
+        for row, color in enumerate(colors, first):
+            self.rows[color.rgba()] = row
+            for step in range(self.steps):
+                painter.save()
+                painter.translate(step*self.cell, row*self.cell)
+                self.render(painter, color, step*360/self.steps, self.center)
+                painter.restore()
+        painter.end()
+        self.pixmap = pixmap
+
+    def row(self, color):
+        key = color.rgba()
+        if key not in self.rows:
+            self.addRows([color])
+        return self.rows[key]
+
+    def headingSteps(self, headings):
+        return numpy.round(numpy.asarray(headings)*self.steps/(2*math.pi)).astype(int) % self.steps
+
+    def draw(self, painter, x, y, heading, color):
+        self.drawCell(painter, x, y, heading, self.row(color))
+
+    def drawCell(self, painter, x, y, heading, row):
+        step = int(round(heading*self.steps/(2*math.pi))) % self.steps
+        painter.drawPixmap(int(x) - self.center, int(y) - self.center, self.pixmap,
+                           step*self.cell, row*self.cell, self.cell, self.cell)
+
+    def drawMany(self, painter, xs, ys, headings, colors):
+        rows = [self.row(color) for color in colors]
+        pixmap = self.pixmap
+        cell = self.cell
+        lefts = (numpy.asarray(xs).astype(int) - self.center).tolist()
+        tops = (numpy.asarray(ys).astype(int) - self.center).tolist()
+        sources = (self.headingSteps(headings)*cell).tolist()
+        for left, top, source, row in zip(lefts, tops, sources, rows):
+            painter.drawPixmap(left, top, pixmap, source, row*cell, cell, cell)
+
+followerSprites = None
+flatSprites = None
+
+# Shared by every flock; QPixmaps can only be made once a QApplication exists
+def followerAtlas():
+    global followerSprites
+    if followerSprites is None:
+        followerSprites = SpriteAtlas()
+    return followerSprites
+
+def flatFollowerAtlas():
+    global flatSprites
+    if flatSprites is None:
+        flatSprites = SpriteAtlas(renderFlat, steps=1)
+    return flatSprites
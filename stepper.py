@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import sys, random, time
+
+import numpy
+
+from PySide import QtCore
+
+from attractor import AttractorSet
+from cursor import defaultCursor, ScriptedCursor, circlePath
+from dasher import DasherBatch
+from dirty import DIRTY_MARGIN
+from flock import Flock
+from metrics import NO_METRICS
+from obstaclemap import ObstacleMap
+from orbiter import OrbitSystem
+
+# Mask of the (n, 4) boxes that overlap the QRect screen
+def visibleRows(boxes, screen):
+    return ((boxes[:, 2] >= screen.left()) & (boxes[:, 0] <= screen.right()) &
+            (boxes[:, 3] >= screen.top()) & (boxes[:, 1] <= screen.bottom()))
+
+# The tick logic of decorator.Board without the QFrame around it.  Nothing in
+# here needs a display, so it can run headless as fast as the CPU allows.
+# Agents are kept in one batch per species, each stepped and drawn with a
+# single call, so the cost of dispatch grows with the number of species
+# rather than the number of agents.
+class Stepper(object):
+
+    def __init__(self, cursor=None, offset=0, seed=None):
+        if seed is not None:
+            random.seed(seed)
+        self.cursor = defaultCursor() if cursor is None else cursor
+        self.offset = offset
+        self.flock = Flock()
+        self.dashers = DasherBatch()
+        self.orbiters = OrbitSystem()
+        # Species, by scene name, whose agents the followers steer clear of
+        self.avoided = []
+        # What the followers steer towards instead of the target, if not empty
+        self.attractors = AttractorSet()
+        # Screen edges and windows the followers keep away from, if any
+        self.obstacleMap = None
+        # Everything stepped one by one rather than in a batch
+        self.others = []
+        self.pieces = []
+        self.target = QtCore.QPointF(5, 10)
+        self.ticks = 0
+        self.metrics = NO_METRICS
+
+    def spawnFollowers(self, count, width, height, left=0, top=0):
+        self.flock.reserve(self.flock.count + count)
+        for i in range(count):
+            piece = self.flock.spawn()
+            piece.x = left + random.randint(0, width)
+            piece.y = top + random.randint(0, height)
+            self.pieces.append(piece)
+
+    # Grows or thins the flock to count followers, spawning new ones at random
+    # inside width x height from left, top
+    def resizeFollowers(self, count, width, height, left=0, top=0):
+        if count > self.flock.count:
+            self.spawnFollowers(count - self.flock.count, width, height, left, top)
+        elif count < self.flock.count:
+            dropped = set(self.flock.views[count:])
+            self.flock.truncate(count)
+            self.pieces[:] = [piece for piece in self.pieces if piece not in dropped]
+
+    def spawnDashers(self, count):
+        self.dashers.reserve(self.dashers.count + count)
+        for i in range(count):
+            self.pieces.append(self.dashers.spawn())
+
+    def spawnOrbiters(self, count):
+        self.orbiters.reserve(self.orbiters.count + count)
+        for i in range(count):
+            self.pieces.append(self.orbiters.spawn())
+
+    # Existing Orbiters, such as orbiter.sol, join the stepper's system
+    def addOrbiters(self, orbiters):
+        for orbiter in orbiters:
+            self.orbiters.adopt(orbiter)
+            self.pieces.append(orbiter)
+
+    # Every batch, in the order they step and draw
+    def batches(self):
+        return (self.flock, self.dashers, self.orbiters)
+
+    # The batch holding the agents of a scene species
+    def batch(self, species):
+        return {'follower': self.flock, 'dasher': self.dashers,
+                'orbiter': self.orbiters, 'sol': self.orbiters}[species]
+
+    # Positions of every agent the followers avoid, or None for none
+    def obstacles(self):
+        if not self.avoided:
+            return None
+        positions = [self.batch(species).positions() for species in self.avoided]
+        return (numpy.concatenate([x for x, y in positions]),
+                numpy.concatenate([y for x, y in positions]))
+
+    # Keeps the followers on the QRects screens and out of the QRects
+    # windows, all in desktop coordinates
+    def keepInside(self, screens, windows=()):
+        screens = list(screens)
+        if self.obstacleMap is not None and self.obstacleMap.screens == screens:
+            self.obstacleMap.setWindows(windows)
+        else:
+            self.obstacleMap = ObstacleMap(screens, windows)
+
+    # A metrics.Metrics for the batches to report to; set again after a
+    # scene replaces a batch
+    def setMetrics(self, metrics):
+        self.metrics = metrics
+        self.flock.metrics = metrics
+        self.dashers.metrics = metrics
+
+    # One of the flock.DETAIL_* levels
+    def setDetail(self, detail):
+        self.flock.detail = detail
+
+    # For pieces with a navigate(target) of their own
+    def add(self, piece):
+        self.others.append(piece)
+        self.pieces.append(piece)
+
+    def sampleCursor(self):
+        x, y = self.cursor.position()
+        try:
+            self.target.setX(x - self.offset)
+        except OverflowError as e:
+            self.target.setX(0)
+        try:
+            self.target.setY(y)
+        except OverflowError as e:
+            self.target.setY(0)
+        self.attractors.follow(self.target)
+
+    def moveTowardsTarget(self):
+        # Followers react to where the other species were before any of them moved
+        self.flock.navigate(self.target, self.obstacles(), self.attractors, self.obstacleMap)
+        self.dashers.navigate(self.target)
+        self.orbiters.navigate(self.target)
+        # Everything not in a batch steps one by one
+        for piece in self.others:
+            piece.navigate(self.target)
+
+    # (n, 4) array of left, top, right, bottom around everything drawn
+    def bounds(self):
+        others = [piece.bounds() for piece in self.others]
+        return numpy.concatenate([batch.bounds() for batch in self.batches()] +
+                                 [numpy.array(others).reshape(-1, 4)])
+
+    # Rows of batch that overlap the QRect screen, or None for all of them.
+    # Bounds are a little tight for sprites, hence the same slack dirty.py adds.
+    def visible(self, batch, screen):
+        if screen is None:
+            return None
+        screen = screen.adjusted(-DIRTY_MARGIN, -DIRTY_MARGIN, DIRTY_MARGIN, DIRTY_MARGIN)
+        return numpy.flatnonzero(visibleRows(batch.bounds(), screen))
+
+    # With a screen, only the agents of each batch that overlap it are drawn.
+    # batches picks which batches to draw, by default all of them.
+    def draw(self, painter, alpha=1.0, screen=None, batches=None):
+        for batch in self.batches() if batches is None else batches:
+            batch.draw(painter, self.target, alpha, self.visible(batch, screen))
+        for piece in self.others:
+            piece.draw(painter, self.target)
+
+    # Several simulation steps against one cursor sample
+    def step(self, count):
+        self.sampleCursor()
+        for i in range(count):
+            self.moveTowardsTarget()
+        self.ticks += count
+        self.metrics.tick(count)
+
+    def tick(self):
+        self.sampleCursor()
+        self.moveTowardsTarget()
+        self.ticks += 1
+        self.metrics.tick()
+
+    def run(self, ticks):
+        for i in range(ticks):
+            self.tick()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    stepper = Stepper(ScriptedCursor(circlePath(400, 300, 200, 360)))
+    stepper.spawnFollowers(count, 800, 600)
+
+    start = time.time()
+    stepper.run(ticks)
+    elapsed = time.time() - start
+    print("%d followers, %d ticks in %.3fs (%.0f TPS)" % (count, ticks, elapsed, ticks/elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from __future__ import division
+
+import os, unittest
+
+import numpy
+
+from cursortrace import GOLDEN_TOLERANCE, goldenDeviation, loadTrace, replay, snapshot
+from dasher import Dasher
+from follower import Follower
+from orbiter import Orbiter
+
+GOLDENS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'goldens')
+
+# Replays goldens/circle.trc, a cursor circling for 100 ticks, through the
+# golden population and checks every species against goldens/circle.npy.
+# Rerecord with cursortrace.py golden goldens/circle.trc goldens/circle.npy
+# after a change meant to alter behaviour.  The run is short since the flock
+# amplifies rounding differences between platforms from tick to tick.
+class CircleGoldenTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        pieces = replay(loadTrace(os.path.join(GOLDENS, 'circle.trc'))).pieces
+        golden = numpy.load(os.path.join(GOLDENS, 'circle.npy'))
+        # snapshot() lays the species out in the order of pieces
+        cls.states = {}
+        cls.goldens = {}
+        offset = 0
+        for kind in (Follower, Dasher, Orbiter):
+            state = snapshot([piece for piece in pieces if isinstance(piece, kind)])
+            cls.states[kind] = state
+            cls.goldens[kind] = golden[offset:offset + len(state)]
+            offset += len(state)
+        cls.leftover = len(golden) - offset
+
+    def checkSpecies(self, kind):
+        self.assertTrue(len(self.states[kind]))
+        self.assertLessEqual(goldenDeviation(self.states[kind], self.goldens[kind]), GOLDEN_TOLERANCE)
+
+    def testNothingElse(self):
+        self.assertEqual(self.leftover, 0)
+
+    def testFollowers(self):
+        self.checkSpecies(Follower)
+
+    def testDashers(self):
+        self.checkSpecies(Dasher)
+
+    def testOrbiters(self):
+        self.checkSpecies(Orbiter)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import division
+
+import math, unittest
+
+import numpy
+from PySide import QtGui
+
+import kernels
+from flock import Flock
+
+SEED = 7
+AGENTS = 5000
+STEPS = 4
+TOLERANCE = 1e-9
+
+# Flock.finalizeHeading keeps headings as unit vectors where
+# Follower.finalizeHeading blends and compares angles.  Every step both start
+# from the same random headings, buffers and update counts, so the two forms
+# are checked against each other directly rather than through a replay that
+# magnifies rounding differences over the ticks.
+class FinalizeHeadingTest(unittest.TestCase):
+
+    def randomFlock(self, random):
+        flock = Flock(AGENTS)
+        color = QtGui.QColor(0)
+        for heading in random.uniform(-math.pi, math.pi, AGENTS):
+            flock.spawn(heading=heading, color=color)
+        return flock
+
+    def randomStep(self, flock, random):
+        n = flock.count
+        flock.movement[:n] = random.uniform(0.5, 4, n)
+        flock.updates[:n] = random.randint(1, 6, n)
+        flock.xBuffer[:n] = random.uniform(-1, 1, n)*flock.updates[:n]
+        flock.yBuffer[:n] = random.uniform(-1, 1, n)*flock.updates[:n]
+
+    def copyRows(self, source, flock):
+        for name in ('xDirection', 'yDirection', 'movement', 'xBuffer', 'yBuffer', 'updates'):
+            getattr(flock, name)[:] = getattr(source, name)
+
+    def checkForm(self, compiled):
+        random = numpy.random.RandomState(SEED)
+        vector = self.randomFlock(random)
+        vector.compiled = compiled
+        angle = self.randomFlock(random)
+        for step in range(STEPS):
+            self.randomStep(vector, random)
+            self.copyRows(vector, angle)
+            vector.finalizeHeading()
+            for follower in angle.views:
+                follower.finalizeHeading()
+            for name in ('xDirection', 'yDirection', 'movement'):
+                deviation = numpy.abs(getattr(vector, name) - getattr(angle, name)).max()
+                self.assertLessEqual(deviation, TOLERANCE, '%s off by %g on step %d' % (name, deviation, step))
+            self.assertFalse(vector.updates.any() or vector.xBuffer.any() or vector.yBuffer.any())
+
+    def testNumpy(self):
+        self.checkForm(False)
+
+    @unittest.skipUnless(kernels.COMPILED, 'needs Numba')
+    def testCompiled(self):
+        self.checkForm(True)
+
+if __name__ == '__main__':
+    unittest.main()
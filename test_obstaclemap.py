@@ -0,0 +1,58 @@
+from __future__ import division
+
+import unittest
+
+import numpy
+from PySide import QtCore
+
+from obstaclemap import ObstacleMap
+
+SEED = 3
+MOVES = 30
+
+SCREENS = [QtCore.QRect(0, 0, 1920, 1080), QtCore.QRect(1920, -300, 2560, 1440),
+           QtCore.QRect(4480, 0, 1280, 1024)]
+
+# setWindows() only works out again the part of the map near the windows
+# that changed, so after any run of changes the map has to be the one a
+# fresh ObstacleMap builds for the same windows
+class SetWindowsTest(unittest.TestCase):
+
+    def checkSame(self, obstacleMap, windows):
+        fresh = ObstacleMap(SCREENS, windows)
+        numpy.testing.assert_array_equal(obstacleMap.distance, fresh.distance)
+        numpy.testing.assert_array_equal(obstacleMap.table, fresh.table)
+
+    def testRandomMoves(self):
+        random = numpy.random.RandomState(SEED)
+        windows = [QtCore.QRect(100, 100, 600, 400)]
+        obstacleMap = ObstacleMap(SCREENS, windows)
+        for i in range(MOVES):
+            change = random.randint(3)
+            if change == 0 and len(windows) < 5:
+                windows.append(QtCore.QRect(random.randint(-200, 5600), random.randint(-400, 1300),
+                                            random.randint(50, 2500), random.randint(50, 1400)))
+            elif change == 1 and windows:
+                windows.pop(random.randint(len(windows)))
+            elif windows:
+                j = random.randint(len(windows))
+                windows[j] = windows[j].translated(random.randint(-60, 60), random.randint(-60, 60))
+            obstacleMap.setWindows(windows)
+            self.checkSame(obstacleMap, windows)
+
+    def testCoverEverything(self):
+        obstacleMap = ObstacleMap(SCREENS)
+        windows = [QtCore.QRect(-100, -400, 6000, 2000)]
+        obstacleMap.setWindows(windows)
+        self.checkSame(obstacleMap, windows)
+        obstacleMap.setWindows([])
+        self.checkSame(obstacleMap, [])
+
+    def testMaximize(self):
+        obstacleMap = ObstacleMap(SCREENS)
+        windows = [QtCore.QRect(SCREENS[1])]
+        obstacleMap.setWindows(windows)
+        self.checkSame(obstacleMap, windows)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+import multiprocessing, sys, time
+
+from multiprocessing.sharedctypes import RawArray
+
+import numpy
+
+from PySide import QtCore, QtGui
+
+from decorator import Board, screenOverlays, metricsOption
+from scene import loadScene, TPS
+from follower import SQUARE_SIZE
+from sprites import followerAtlas
+from stepper import Stepper
+
+# Rows of each published state buffer
+FIELDS = ('x', 'y', 'heading', 'color')
+# Cursor samples the ring holds before the oldest are overwritten
+RING_SIZE = 64
+
+# Header slots of SharedFlock: the sequence, then the agent count of each
+# buffer
+SEQUENCE = 0
+COUNT = 1
+
+# Two state buffers in shared memory, guarded by a sequence lock.  SEQUENCE
+# goes odd while the worker writes buffer ((SEQUENCE + 1)//2) % 2 and even
+# once it is done, when that buffer becomes the front one.  The GUI copies the
+# front buffer and checks SEQUENCE again afterwards: the worker only returns
+# to that buffer two publishes later, so unless SEQUENCE moved that far the
+# copy is one complete state, and otherwise it copies again.  The worker
+# never waits for the GUI.
+class SharedFlock(object):
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.header = RawArray('q', 3)
+        self.buffers = (RawArray('d', len(FIELDS)*capacity), RawArray('d', len(FIELDS)*capacity))
+
+    def view(self, index):
+        return numpy.frombuffer(self.buffers[index], dtype=numpy.float64).reshape(len(FIELDS), self.capacity)
+
+    # Worker side: copy the flock into the back buffer and make it the front
+    def publish(self, flock):
+        sequence = self.header[SEQUENCE]
+        back = (sequence//2 + 1) % 2
+        self.header[SEQUENCE] = sequence + 1
+        n = min(flock.count, self.capacity)
+        state = self.view(back)
+        state[0, :n] = flock.x[:n]
+        state[1, :n] = flock.y[:n]
+        state[2, :n] = flock.headings()[:n]
+        state[3, :n] = [color.rgb() & 0xFFFFFF for color in flock.colors[:n]]
+        self.header[COUNT + back] = n
+        self.header[SEQUENCE] = sequence + 2
+
+    # Number of states published so far
+    def sequence(self):
+        return self.header[SEQUENCE]//2
+
+    # GUI side: a copy of the newest complete state
+    def front(self):
+        while True:
+            sequence = self.header[SEQUENCE]
+            index = (sequence//2) % 2
+            n = self.header[COUNT + index]
+            state = self.view(index)[:, :n].copy()
+            if self.header[SEQUENCE] - sequence//2*2 <= 2:
+                return state[0], state[1], state[2], state[3]
+
+# Single-producer single-consumer ring of cursor samples.  The GUI writes a
+# slot and then bumps HEAD; the worker only reads slots below HEAD, so neither
+# side needs a lock.
+class CursorRing(object):
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.head = RawArray('q', 1)
+        self.samples = RawArray('d', 2*size)
+        self.tail = 0
+
+    def push(self, x, y):
+        slot = self.head[0] % self.size
+        self.samples[2*slot] = x
+        self.samples[2*slot + 1] = y
+        self.head[0] += 1
+
+    # Cursor source for the worker's Stepper: the newest sample, skipping any
+    # the simulation was too slow to see
+    def position(self):
+        head = self.head[0]
+        if head:
+            self.tail = head
+        slot = (self.tail - 1) % self.size
+        return self.samples[2*slot], self.samples[2*slot + 1]
+
+# QRects do not pickle, so they cross to the worker as (x, y, width, height)
+def rectTuple(rect):
+    return (rect.x(), rect.y(), rect.width(), rect.height())
+
+def simulate(shared, ring, stop, count, width, height, left, top, screens, windows, tps, seed):
+    stepper = Stepper(ring, seed=seed)
+    stepper.spawnFollowers(count, width, height, left, top)
+    if screens:
+        stepper.keepInside([QtCore.QRect(*screen) for screen in screens],
+                           [QtCore.QRect(*window) for window in windows])
+    interval = 1/tps
+    deadline = time.time()
+    while not stop.is_set():
+        stepper.tick()
+        shared.publish(stepper.flock)
+        deadline += interval
+        delay = deadline - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            deadline = time.time()
+
+# GUI-side handle on a simulation running in its own process, whose
+# followers spawn inside width x height from left, top
+class SimulationWorker(object):
+
+    def __init__(self, count, width, height, left=0, top=0, tps=TPS, seed=None):
+        self.shared = SharedFlock(count)
+        self.ring = CursorRing()
+        self.stop = multiprocessing.Event()
+        self.settings = (count, width, height, left, top)
+        self.tps = tps
+        self.seed = seed
+        self.process = None
+
+    # With screens the followers keep on them and out of the windows, QRects
+    # in desktop coordinates, as Stepper.keepInside() has them
+    def start(self, screens=(), windows=()):
+        self.process = multiprocessing.Process(
+            target=simulate,
+            args=(self.shared, self.ring, self.stop) + self.settings +
+                 ([rectTuple(screen) for screen in screens], [rectTuple(window) for window in windows],
+                  self.tps, self.seed))
+        self.process.daemon = True
+        self.process.start()
+
+    def started(self):
+        return self.process is not None
+
+    def join(self):
+        if self.process is None:
+            return
+        self.stop.set()
+        self.process.join()
+
+    def pushCursor(self, x, y):
+        self.ring.push(x, y)
+
+    def front(self):
+        return self.shared.front()
+
+# Board whose timer only forwards the cursor and repaints; the physics runs
+# in a SimulationWorker.  Boards on other screens share their lead's worker.
+class WorkerBoard(Board):
+
+    def __init__(self, parent, lead=None):
+        super(WorkerBoard, self).__init__(parent, lead)
+        self.colors = {}
+        if lead is not None:
+            self.worker = lead.worker
+
+    # Nothing is stepped or spawned in this process, only the worker set up.
+    # It only simulates followers; other agent types in the scene are ignored.
+    def simulate(self, scene):
+        self.stepper = None
+        self.painted = -1
+        screen = self.screen
+        self.worker = SimulationWorker(scene.count('follower'), screen.width(), screen.height(),
+                                       screen.left(), screen.top(), scene.tps)
+
+    def start(self):
+        if self.lead is not self:
+            return
+        self.timer.start(int(1000/self.scene.fps), self)
+
+    # The worker starts on the first frame, once the boards of every screen
+    # have joined, so it keeps the followers on all of them
+    def confine(self):
+        if self.worker.started():
+            return
+        scene = self.scene
+        screens = [board.screen for board in self.screens] if scene.keepOnScreen else ()
+        self.worker.start(screens, scene.windows)
+
+    # The HUD shows the cursor and paint times of this process, and the
+    # worker's ticks as the states it published; the other phases happen
+    # in the worker and read zero
+    def moveTowardsTarget(self):
+        self.confine()
+        self.metrics.start()
+        self.cursor.poll()
+        x, y = self.cursor.position()
+        self.worker.pushCursor(x, y)
+        self.metrics.lap('cursor')
+        sequence = self.worker.shared.sequence()
+        if sequence != self.painted:
+            self.metrics.tick(sequence - max(self.painted, 0))
+            self.painted = sequence
+            for board in self.screens:
+                board.update()
+        self.metrics.frame()
+        if self.hud.update({'population': self.worker.settings[0]}):
+            for board in self.screens:
+                board.refreshHud()
+
+    def color(self, rgb):
+        if rgb not in self.colors:
+            self.colors[rgb] = QtGui.QColor(int(rgb))
+        return self.colors[rgb]
+
+    def paintEvent(self, event):
+        self.metrics.start()
+        x, y, heading, colors = self.worker.front()
+        screen = self.screen
+        shown = ((x >= screen.left() - SQUARE_SIZE) & (x <= screen.right() + SQUARE_SIZE) &
+                 (y >= screen.top() - SQUARE_SIZE) & (y <= screen.bottom() + SQUARE_SIZE))
+        painter = QtGui.QPainter(self)
+        painter.translate(-screen.left(), -screen.top())
+        followerAtlas().drawMany(painter, x[shown], y[shown], heading[shown],
+                                 [self.color(rgb) for rgb in colors[shown].tolist()])
+        painter.resetTransform()
+        self.hud.draw(painter)
+        painter.end()
+        self.metrics.lap('paint')
+
+def main():
+
+    app = QtGui.QApplication(sys.argv)
+    # Optional scene file and --metrics PATH, as for decorator.py
+    args = app.arguments()[1:]
+    metricsPath = metricsOption(args)
+    overlays = screenOverlays(WorkerBoard, loadScene(args[0]) if args else None, metricsPath)
+    for t in overlays:
+        t.show()
+    status = app.exec_()
+    overlays[0].overlay.worker.join()
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()